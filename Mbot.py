@@ -1,10 +1,9 @@
+import argparse
 import logging
-import sqlite3
-from datetime import datetime, time, timedelta
-import asyncio
+import os
+import tempfile
+from datetime import datetime, time, timedelta, timezone
 from telegram import (
-    ReplyKeyboardMarkup,
-    KeyboardButton,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     Update
@@ -18,7 +17,37 @@ from telegram.ext import (
     ConversationHandler
 )
 from telegram.ext import filters
-import re
+
+import config
+from cache import ProductListCache, TimezoneCache
+from database import Database, check_profile, connect
+from dates import DateFormatError, InvalidDateError, parse_date
+from exporter import EXPORT_FORMATS, export_products
+from importer import import_products, render_import_result
+from maintenance import get_archive, init_incremental_vacuum, run_maintenance
+from metrics import InstrumentedRequest, start_server as start_metrics_server, timed_handler
+from migrations import migrate
+from outgoing import OutgoingLimiter
+from persistence import SQLitePersistence
+from products import change_warranty, delete_product, get_product, insert_product, parse_product_id, rename_product
+from reminder_run import resume_reminders, run_hour, run_shard, run_sharded, run_wheel
+from reminders import next_reminder_day
+from scheduler import ReminderWheel, load_wheel, reschedule_products, reschedule_user
+from timezones import get_settings, local_today, parse_timezone, update_settings
+from rendering import (
+    CANCEL_MENU,
+    DELETE_CONFIRM_MENU,
+    EMPTY_LIST_TEXT,
+    MAIN_MENU,
+    PRODUCT_MENU,
+    render_archive,
+    render_delete_confirm,
+    render_product_card,
+    render_product_list
+)
+from update_processor import PerUserUpdateProcessor
+from users import activate_user
+from webhook import run_webhook
 
 # Настройка логирования - отключаем лишние логи
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -37,118 +66,80 @@ EDIT_NAME, EDIT_DATE = range(2, 4)
 
 
 # Инициализация базы данных
-def init_db():
-    conn = sqlite3.connect('warranty_bot.db', check_same_thread=False)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            product_name TEXT NOT NULL,
-            warranty_date TEXT NOT NULL,
-            category TEXT,
-            store TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    conn.commit()
+def init_db(path=None):
+    conn = connect(path or config.DB_PATH)
+
+    # Проверяем, что профиль хранения применился (например, WAL недоступен на сетевых дисках)
+    for mismatch in check_profile(conn):
+        logger.warning(f"Профиль хранения '{config.DB_PROFILE}' применен не полностью: {mismatch}")
+
+    # Создаем и обновляем схему. Существующую базу на incremental auto_vacuum переводит
+    # ночное обслуживание (maintain_db), чтобы долгий VACUUM не задерживал старт
+    init_incremental_vacuum(conn)
+    migrate(conn)
+
     return conn
 
 
-# Главное меню
-def main_menu():
-    return ReplyKeyboardMarkup([
-        [KeyboardButton("📦 Добавить товар"), KeyboardButton("📋 Мои товары")]
-    ], resize_keyboard=True)
-
-
-# Меню отмены (для состояний добавления/редактирования)
-def cancel_menu():
-    return ReplyKeyboardMarkup([
-        [KeyboardButton("↩️ Отмена")]
-    ], resize_keyboard=True)
-
-
-# Функция для преобразования даты с коротким годом
-def parse_date_with_short_year(date_text):
-    # Проверяем формат ДД.ММ.ГГ или ДД.ММ.ГГГГ
-    if re.match(r'^\d{1,2}\.\d{1,2}\.\d{2}$', date_text):
-        # Преобразуем год из двух цифр в четыре
-        parts = date_text.split('.')
-        day = parts[0].zfill(2)
-        month = parts[1].zfill(2)
-        year_short = parts[2]
-        year_full = f"20{year_short}"  # Предполагаем 21 век
-        return f"{day}.{month}.{year_full}"
-    elif re.match(r'^\d{1,2}\.\d{1,2}\.\d{4}$', date_text):
-        parts = date_text.split('.')
-        day = parts[0].zfill(2)
-        month = parts[1].zfill(2)
-        year_full = parts[2]
-        return f"{day}.{month}.{year_full}"
+# Ставит товары в колесо напоминаний (если оно включено): по id или все товары пользователя
+async def schedule_reminders(context, user_id, product_id=None):
+    wheel = context.bot_data.get('reminder_wheel')
+    if wheel is None:
+        return
+    if product_id is None:
+        await reschedule_user(context.bot_data['db'], wheel, user_id)
     else:
-        return None
-
-# Функция для отправки ежедневных напоминаний
-async def send_daily_reminders(context: ContextTypes.DEFAULT_TYPE):
-    logger.info("Запуск ежедневной проверки напоминаний...")
-
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
-
-    today = datetime.now().date()
-
-    # Находим все активные товары (гарантия еще не истекла)
-    cursor.execute('''
-        SELECT DISTINCT user_id, product_name, warranty_date 
-        FROM products 
-        WHERE warranty_date >= ?
-    ''', (today.strftime('%Y-%m-%d'),))
-
-    products = cursor.fetchall()
-
-    reminders_sent = 0
-
-    for user_id, product_name, warranty_date_str in products:
-        warranty_date = datetime.strptime(warranty_date_str, '%Y-%m-%d').date()
-        days_left = (warranty_date - today).days
-
-        # ✅ ПРАВИЛЬНО: уведомления ТОЛЬКО за 30, 14, 7, 1, 0 дней
-        if days_left in [30, 14, 7, 1, 0]:
-            if days_left == 0:
-                message = f"⚠️ *СРОЧНО!* Гарантия на '{product_name}' истекает сегодня!"
-            elif days_left == 1:
-                message = f"🔔 Завтра истекает гарантия на '{product_name}'"
-            elif days_left == 7:
-                message = f"📢 Неделя осталась! Гарантия на '{product_name}' истекает через 7 дней"
-            elif days_left == 14:
-                message = f"📅 Напоминание: до окончания гарантии на '{product_name}' осталось 14 дней"
-            elif days_left == 30:
-                message = f"📅 Напоминание: до окончания гарантии на '{product_name}' остался 1 месяц"
-
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode='Markdown'
-                )
-                reminders_sent += 1
-                logger.info(
-                    f"Отправлено напоминание пользователю {user_id} для товара {product_name} (осталось {days_left} дней)")
+        await reschedule_products(context.bot_data['db'], wheel, [product_id])
+
+
+# Сегодняшняя дата пользователя по его часовому поясу - та же, что у рассылки напоминаний.
+# От нее считаются проверка даты в будущем, первое напоминание и оставшиеся дни.
+# Пояс берется из кэша в памяти, в базу идем только при первом обращении пользователя
+async def user_today(context: ContextTypes.DEFAULT_TYPE, user_id):
+    timezones = context.bot_data['timezone_cache']
+    timezone_name = timezones.get(user_id)
+    if timezone_name is None:
+        timezone_name, _ = await context.bot_data['db'].read(get_settings, user_id)
+        timezones.put(user_id, timezone_name)
+    return local_today(timezone_name)
+
+
+# Ежечасная рассылка напоминаний: только пользователям, у которых сейчас выбранный ими час
+async def send_reminders(context: ContextTypes.DEFAULT_TYPE):
+    now = datetime.now(timezone.utc)
+    logger.info(f"Запуск рассылки напоминаний за {now:%H}:00 UTC...")
+
+    if 'reminder_wheel' in context.bot_data:
+        # Только товары созревших слотов колеса, без сканирования таблицы
+        summary = await run_wheel(context.bot_data['db'], context.bot, context.bot_data['reminder_wheel'], now)
+    elif config.REMINDER_SHARDS > 1:
+        # Каждый шард пользователей рассылается в своем процессе
+        summary = await run_sharded(now, config.REMINDER_SHARDS, context.bot.rate_limiter)
+    else:
+        summary = await run_hour(context.bot_data['db'], context.bot, now)
 
-                # Небольшая задержка между сообщениями чтобы не превысить лимиты Telegram
-                await asyncio.sleep(0.1)
+    summary.record_metrics()
+    logger.info(f"Рассылка завершена: {summary.describe()}")
 
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
 
-    logger.info(f"Ежедневная проверка завершена. Отправлено напоминаний: {reminders_sent}")
+# Дорассылка при старте: если процесс упал посреди рассылки, поставленные в очередь
+# напоминания отправляются сразу, не дожидаясь следующего часа
+async def resume_interrupted_reminders(context: ContextTypes.DEFAULT_TYPE):
+    summary = await resume_reminders(context.bot_data['db'], context.bot, datetime.now(timezone.utc).date())
+    if summary.stats.sent or summary.stats.failed:
+        summary.record_metrics()
+        logger.info(f"Дорассылка после перезапуска: {summary.describe()}")
+
 
 # Старт бота
+@timed_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.message.from_user
+
+    # Пользователь, который раньше заблокировал бота, снова получает напоминания
+    if await context.bot_data['db'].write(activate_user, user.id):
+        logger.info(f"Пользователь {user.id} снова активен")
+        await schedule_reminders(context, user.id)
     welcome_text = f"""
 *Ну здарова, аферист!*
 
@@ -158,20 +149,22 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 *Выберите действие в меню ниже* 👇
     """
 
-    await update.message.reply_text(welcome_text, reply_markup=main_menu(), parse_mode='Markdown')
+    await update.message.reply_text(welcome_text, reply_markup=MAIN_MENU, parse_mode='Markdown')
 
 
 # Начало добавления товара
+@timed_handler
 async def add_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text(
         "*📝 Введите название товара:*",
-        reply_markup=cancel_menu(),
+        reply_markup=CANCEL_MENU,
         parse_mode='Markdown'
     )
     return ADD_PRODUCT
 
 
 # Получение названия товара
+@timed_handler
 async def add_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     product_name = update.message.text
 
@@ -182,7 +175,7 @@ async def add_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if product_name in ["📦 Добавить товар", "📋 Мои товары"]:
         await update.message.reply_text(
             "❌ *Нельзя использовать команды бота в качестве названия товара!*\n\nДавай другое:",
-            reply_markup=cancel_menu(),
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return ADD_PRODUCT
@@ -190,70 +183,58 @@ async def add_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     context.user_data['new_product'] = {'name': product_name}
 
     await update.message.reply_text(
-        "*📅 Введите дату окончания гарантии в формате ДД.ММ.ГГ:*\n\n*Например: 30.12.25*",
-        reply_markup=cancel_menu(),
+        "*📅 Введите дату окончания гарантии в формате ДД.ММ.ГГ:*\n\n*Например: 30.12.25 или +1г*",
+        reply_markup=CANCEL_MENU,
         parse_mode='Markdown'
     )
     return ADD_DATE
 
 
 # Получение даты и сохранение товара
+@timed_handler
 async def add_product_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     date_text = update.message.text
 
     if date_text == "↩️ Отмена":
         return await cancel_add(update, context)
 
-    # Преобразуем дату с коротким годом в полный формат
-    normalized_date = parse_date_with_short_year(date_text)
+    today = await user_today(context, update.message.from_user.id)
 
-    if not normalized_date:
+    try:
+        warranty_date = parse_date(date_text, today)
+    except DateFormatError:
         await update.message.reply_text(
-            "❌ *Неверный формат даты! Используйте ДД.ММ.ГГГГ или ДД.ММ.ГГ*\n\nПопробуйте еще раз:",
-            reply_markup=cancel_menu(),
+            "❌ *Неверный формат даты! Используйте ДД.ММ.ГГГГ, ДД.ММ.ГГ или +6м / +1г*\n\nПопробуйте еще раз:",
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return ADD_DATE
-
-    # Проверка формата даты
-    if not re.match(r'^\d{2}\.\d{2}\.\d{4}$', normalized_date):
+    except InvalidDateError:
         await update.message.reply_text(
-            "❌ *Неверный формат даты! Используйте ДД.ММ.ГГГГ или ДД.ММ.ГГ*\n\nПопробуйте еще раз:",
-            reply_markup=cancel_menu(),
+            "❌ *Неверная дата! Проверьте правильность ввода.*\n\nПопробуйте еще раз:",
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return ADD_DATE
 
-    try:
-        warranty_date = datetime.strptime(normalized_date, '%d.%m.%Y').date()
-        today = datetime.now().date()
-
-        if warranty_date <= today:
-            await update.message.reply_text(
-                "❌ *Дата должна быть в будущем!*\n\nВведите корректную дату:",
-                reply_markup=cancel_menu(),
-                parse_mode='Markdown'
-            )
-            return ADD_DATE
-
-    except ValueError:
+    if warranty_date <= today:
         await update.message.reply_text(
-            "❌ *Неверная дата! Проверьте правильность ввода.*\n\nПопробуйте еще раз:",
-            reply_markup=cancel_menu(),
+            "❌ *Дата должна быть в будущем!*\n\nВведите корректную дату:",
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return ADD_DATE
 
     # Сохранение в базу данных
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
+    db = context.bot_data['db']
 
     product_name = context.user_data['new_product']['name']
-    cursor.execute(
-        'INSERT INTO products (user_id, product_name, warranty_date) VALUES (?, ?, ?)',
-        (update.message.from_user.id, product_name, warranty_date.strftime('%Y-%m-%d'))
+    product = await db.write(
+        insert_product, update.message.from_user.id, product_name, warranty_date.toordinal(),
+        next_reminder_day(warranty_date.toordinal(), today.toordinal())
     )
-    conn.commit()
+    context.bot_data['product_cache'].invalidate(update.message.from_user.id)
+    await schedule_reminders(context, update.message.from_user.id, product.id)
 
     # Очистка временных данных
     context.user_data.pop('new_product', None)
@@ -267,7 +248,7 @@ async def add_product_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         f"📅 *Гарантия до:* {warranty_date.strftime('%d.%m.%Y')}\n"
         f"⏳ *Осталось дней:* {days_left}\n\n"
         f"*Не ссы, я напомню об окончании гарантии заранее!*",
-        reply_markup=main_menu(),
+        reply_markup=MAIN_MENU,
         parse_mode='Markdown'
     )
 
@@ -275,131 +256,135 @@ async def add_product_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 
 # Отмена добавления товара
+@timed_handler
 async def cancel_add(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.pop('new_product', None)
     await update.message.reply_text(
         "❌ *Добавление товара отменено.*",
-        reply_markup=main_menu(),
+        reply_markup=MAIN_MENU,
         parse_mode='Markdown'
     )
     return ConversationHandler.END
 
 
+# Страница списка товаров пользователя: (текст, клавиатура) или (None, None), если товаров нет.
+# Страницы выбираются по ключу (warranty_date, id): direction 'next' - товары после cursor,
+# 'prev' - перед ним, без direction - первая страница. Поэтому стоимость запроса и размер
+# сообщения не зависят от количества товаров.
+# Первая страница берется из кэша, пока товары не менялись и не сменился день.
+async def get_product_list(context: ContextTypes.DEFAULT_TYPE, user_id, page=1, direction=None, cursor=None):
+    cache = context.bot_data['product_cache']
+    today_day = (await user_today(context, user_id)).toordinal()
+
+    if direction is None:
+        cached = cache.get(user_id, today_day)
+        if cached:
+            return cached
+
+    db = context.bot_data['db']
+    page_size = config.PRODUCT_PAGE_SIZE
+
+    if direction == 'prev':
+        products = await db.fetchall(
+            'SELECT id, product_name, warranty_date FROM products '
+            'WHERE user_id = ? AND (warranty_date, id) < (?, ?) '
+            'ORDER BY warranty_date DESC, id DESC LIMIT ?',
+            (user_id, *cursor, page_size + 1)
+        )
+        has_prev = len(products) > page_size
+        products = products[:page_size][::-1]
+        has_next = True
+    elif direction == 'next':
+        products = await db.fetchall(
+            'SELECT id, product_name, warranty_date FROM products '
+            'WHERE user_id = ? AND (warranty_date, id) > (?, ?) '
+            'ORDER BY warranty_date, id LIMIT ?',
+            (user_id, *cursor, page_size + 1)
+        )
+        has_next = len(products) > page_size
+        products = products[:page_size]
+        has_prev = True
+    else:
+        products = await db.fetchall(
+            'SELECT id, product_name, warranty_date FROM products '
+            'WHERE user_id = ? ORDER BY warranty_date, id LIMIT ?',
+            (user_id, page_size + 1)
+        )
+        has_next = len(products) > page_size
+        products = products[:page_size]
+        has_prev = False
+
+    if not products:
+        if direction is None:
+            cache.put(user_id, today_day, None, None)
+        return None, None
+
+    if has_prev or has_next:
+        header = f"*📋 Ваши товары (стр. {page}):*\n\n"
+    else:
+        header = "*📋 Ваши товары:*\n\n"
+    message, keyboard = render_product_list(products, today_day, header)
+
+    # Кнопки листания несут ключ первого/последнего товара страницы
+    navigation = []
+    if has_prev:
+        first_id, _, first_day = products[0]
+        navigation.append(
+            InlineKeyboardButton("◀️ Назад", callback_data=f"list_prev_{page - 1}_{first_day}_{first_id}")
+        )
+    if has_next:
+        last_id, _, last_day = products[-1]
+        navigation.append(
+            InlineKeyboardButton("Вперед ▶️", callback_data=f"list_next_{page + 1}_{last_day}_{last_id}")
+        )
+    if navigation:
+        keyboard.append(navigation)
+
+    keyboard = InlineKeyboardMarkup(keyboard)
+    if direction is None:
+        cache.put(user_id, today_day, message, keyboard)
+    return message, keyboard
+
+
 # Показать все товары пользователя с кнопками управления
+@timed_handler
 async def show_products(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = update.message.from_user.id
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
-
-    cursor.execute(
-        'SELECT id, product_name, warranty_date FROM products WHERE user_id = ? ORDER BY warranty_date',
-        (user_id,)
-    )
-    products = cursor.fetchall()
+    message, keyboard = await get_product_list(context, update.message.from_user.id)
 
-    if not products:
+    if not message:
         await update.message.reply_text(
-            "*📭 У вас пока нет добавленных товаров.*\n\n*Нажмите* \"📦 Добавить товар\"*, чтобы добавить первый товар.*",
-            reply_markup=main_menu(),
+            EMPTY_LIST_TEXT,
+            reply_markup=MAIN_MENU,
             parse_mode='Markdown'
         )
         return
 
-    today = datetime.now().date()
-    message = "*📋 Ваши товары:*\n\n"
-
-    # Создаем клавиатуру с товарами
-    keyboard = []
-
-    for product in products:
-        product_id, product_name, warranty_date_str = product
-        warranty_date = datetime.strptime(warranty_date_str, '%Y-%m-%d').date()
-        days_left = (warranty_date - today).days
-
-        # Убрали статус "Активна" - показываем только предупреждения
-        if days_left < 0:
-            status = "❌ Просрочено"
-        elif days_left == 0:
-            status = "⚠️ Заканчивается сегодня"
-        elif days_left <= 7:
-            status = "🔥 Срочно"
-        elif days_left <= 30:
-            status = "⚠️ Скоро закончится"
-        else:
-            status = None
-
-        # Добавляем информацию о товаре в сообщение
-        message += f"📦 *{product_name}*\n"
-        message += f"📅 *До:* {warranty_date.strftime('%d.%m.%Y')}\n"
-        message += f"⏳ *Осталось:* {days_left} дней\n"
-        if status:
-            message += f"📊 *{status}*\n"
-        message += "\n"
-
-        # Добавляем кнопку редактирования для каждого товара
-        display_name = product_name[:30] + "..." if len(product_name) > 30 else product_name
-        keyboard.append([
-            InlineKeyboardButton(f"✏️ {display_name}", callback_data=f"edit_{product_id}")
-        ])
-
     await update.message.reply_text(
         message,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=keyboard,
         parse_mode='Markdown'
     )
 
 
 # Обработка выбора товара для редактирования
+@timed_handler
 async def edit_product_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
 
-    product_id = query.data.split('_')[1]
+    product_id = parse_product_id(query.data.split('_')[1])
     context.user_data['editing_product_id'] = product_id
 
-    # Получаем информацию о товаре
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
-    cursor.execute(
-        'SELECT product_name, warranty_date FROM products WHERE id = ?',
-        (product_id,)
-    )
-    product = cursor.fetchone()
+    # Получаем информацию о товаре (только своем)
+    db = context.bot_data['db']
+    product = await db.read(get_product, product_id, query.from_user.id)
 
     if product:
-        product_name, warranty_date = product
-        formatted_date = datetime.strptime(warranty_date, '%Y-%m-%d').strftime('%d.%m.%Y')
-        today = datetime.now().date()
-        warranty_date_obj = datetime.strptime(warranty_date, '%Y-%m-%d').date()
-        days_left = (warranty_date_obj - today).days
-
-        # Клавиатура управления товаром
-        keyboard = [
-            [InlineKeyboardButton("✏️ Изменить название", callback_data="edit_name")],
-            [InlineKeyboardButton("📅 Изменить дату гарантии", callback_data="edit_date")],
-            [InlineKeyboardButton("🗑️ Удалить товар", callback_data="delete_product")],
-            [InlineKeyboardButton("↩️ Назад к списку", callback_data="back_to_list")]
-        ]
-
-        # Убрали статус "Активна"
-        status = None
-        if days_left < 0:
-            status = "❌ Просрочено"
-        elif days_left <= 7:
-            status = "🔥 Срочно"
-        elif days_left <= 30:
-            status = "⚠️ Скоро закончится"
-
-        status_text = f"📊 *Статус:* {status}\n" if status else ""
-
         await query.edit_message_text(
-            f"*✏️ Управление товаром:*\n\n"
-            f"📦 *{product_name}*\n"
-            f"📅 *Гарантия до:* {formatted_date}\n"
-            f"⏳ *Осталось дней:* {days_left}\n"
-            f"{status_text}\n"
-            f"*Выберите действие:*",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            render_product_card(
+                product.name, product.warranty_day, (await user_today(context, query.from_user.id)).toordinal()
+            ),
+            reply_markup=PRODUCT_MENU,
             parse_mode='Markdown'
         )
     else:
@@ -407,6 +392,7 @@ async def edit_product_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 # Обработка выбора действия в меню управления товаром
+@timed_handler
 async def edit_choice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -420,30 +406,13 @@ async def edit_choice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         product_id = context.user_data.get('editing_product_id')
 
         if product_id:
-            conn = context.bot_data['db_connection']
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT product_name FROM products WHERE id = ?',
-                (product_id,)
-            )
-            result = cursor.fetchone()
-
-            if result:
-                product_name = result[0]
-
-                # Клавиатура подтверждения удаления
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Да, удалить", callback_data="confirm_delete"),
-                        InlineKeyboardButton("❌ Нет, отмена", callback_data="cancel_delete")
-                    ]
-                ]
+            db = context.bot_data['db']
+            product = await db.read(get_product, product_id, query.from_user.id)
 
+            if product:
                 await query.edit_message_text(
-                    f"*🗑️ Подтверждение удаления*\n\n"
-                    f"*Вы уверены, что хотите удалить товар?*\n\n"
-                    f"📦 *{product_name}*\n\n",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    render_delete_confirm(product.name),
+                    reply_markup=DELETE_CONFIRM_MENU,
                     parse_mode='Markdown'
                 )
         else:
@@ -467,6 +436,7 @@ async def edit_choice_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return EDIT_DATE
 # Обработка отмены удаления
+@timed_handler
 async def cancel_delete_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -476,48 +446,15 @@ async def cancel_delete_handler(update: Update, context: ContextTypes.DEFAULT_TY
 
     if product_id:
         # Получаем актуальную информацию о товаре из БД
-        conn = context.bot_data['db_connection']
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT product_name, warranty_date FROM products WHERE id = ?',
-            (product_id,)
-        )
-        product = cursor.fetchone()
+        db = context.bot_data['db']
+        product = await db.read(get_product, product_id, query.from_user.id)
 
         if product:
-            product_name, warranty_date = product
-            formatted_date = datetime.strptime(warranty_date, '%Y-%m-%d').strftime('%d.%m.%Y')
-            today = datetime.now().date()
-            warranty_date_obj = datetime.strptime(warranty_date, '%Y-%m-%d').date()
-            days_left = (warranty_date_obj - today).days
-
-            # Клавиатура управления товаром
-            keyboard = [
-                [InlineKeyboardButton("✏️ Изменить название", callback_data="edit_name")],
-                [InlineKeyboardButton("📅 Изменить дату гарантии", callback_data="edit_date")],
-                [InlineKeyboardButton("🗑️ Удалить товар", callback_data="delete_product")],
-                [InlineKeyboardButton("↩️ Назад к списку", callback_data="back_to_list")]
-            ]
-
-            # Статус товара
-            status = None
-            if days_left < 0:
-                status = "❌ Просрочено"
-            elif days_left <= 7:
-                status = "🔥 Срочно"
-            elif days_left <= 30:
-                status = "⚠️ Скоро закончится"
-
-            status_text = f"📊 *Статус:* {status}\n" if status else ""
-
             await query.edit_message_text(
-                f"*✏️ Управление товаром:*\n\n"
-                f"📦 *{product_name}*\n"
-                f"📅 *Гарантия до:* {formatted_date}\n"
-                f"⏳ *Осталось дней:* {days_left}\n"
-                f"{status_text}\n"
-                f"*Выберите действие:*",
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                render_product_card(
+                    product.name, product.warranty_day, (await user_today(context, query.from_user.id)).toordinal()
+                ),
+                reply_markup=PRODUCT_MENU,
                 parse_mode='Markdown'
             )
         else:
@@ -533,6 +470,7 @@ async def cancel_delete_handler(update: Update, context: ContextTypes.DEFAULT_TY
         )
 
 # Обработка подтверждения удаления
+@timed_handler
 async def confirm_delete_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -540,29 +478,20 @@ async def confirm_delete_handler(update: Update, context: ContextTypes.DEFAULT_T
     product_id = context.user_data.get('editing_product_id')
 
     if product_id:
-        conn = context.bot_data['db_connection']
-        cursor = conn.cursor()
+        db = context.bot_data['db']
 
-        # Получаем информацию о товаре перед удалением
-        cursor.execute(
-            'SELECT product_name FROM products WHERE id = ?',
-            (product_id,)
-        )
-        result = cursor.fetchone()
+        # Удаляем товар одним запросом, название для сообщения возвращается из базы
+        product = await db.write(delete_product, product_id, query.from_user.id)
 
-        if result:
-            product_name = result[0]
-
-            # Удаляем товар
-            cursor.execute('DELETE FROM products WHERE id = ?', (product_id,))
-            conn.commit()
+        if product:
+            context.bot_data['product_cache'].invalidate(query.from_user.id)
 
             # Удаляем сообщение с инлайн-клавиатурой и отправляем новое сообщение
             await query.delete_message()
             await context.bot.send_message(
                 chat_id=query.from_user.id,
-                text=f"✅ *Товар успешно удален!*\n\n📦 *{product_name}*\n\n*Больше не отслеживается.*",
-                reply_markup=main_menu(),
+                text=f"✅ *Товар успешно удален!*\n\n📦 *{product.name}*\n\n*Больше не отслеживается.*",
+                reply_markup=MAIN_MENU,
                 parse_mode='Markdown'
             )
 
@@ -583,6 +512,7 @@ async def confirm_delete_handler(update: Update, context: ContextTypes.DEFAULT_T
         )
 
 # Обработка изменения названия
+@timed_handler
 async def edit_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     # Это текстовое сообщение с новым названием
     new_name = update.message.text
@@ -591,7 +521,7 @@ async def edit_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if new_name == "↩️ Отмена":
         await update.message.reply_text(
             "❌ *Изменение названия отменено.*",
-            reply_markup=main_menu(),
+            reply_markup=MAIN_MENU,
             parse_mode='Markdown'
         )
         context.user_data.pop('editing_product_id', None)
@@ -601,7 +531,7 @@ async def edit_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if new_name in ["📦 Добавить товар", "📋 Мои товары"]:
         await update.message.reply_text(
             "❌ *Нельзя использовать команды бота в качестве названия товара!*\n\nВведите другое название:",
-            reply_markup=cancel_menu(),
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return EDIT_NAME
@@ -611,31 +541,37 @@ async def edit_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not product_id:
         await update.message.reply_text(
             "❌ *Ошибка: товар не найден.*",
-            reply_markup=main_menu(),
+            reply_markup=MAIN_MENU,
             parse_mode='Markdown'
         )
         return ConversationHandler.END
 
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
+    db = context.bot_data['db']
 
-    cursor.execute(
-        'UPDATE products SET product_name = ? WHERE id = ?',
-        (new_name, product_id)
-    )
-    conn.commit()
+    product = await db.write(rename_product, product_id, update.message.from_user.id, new_name)
+    context.user_data.pop('editing_product_id', None)
+
+    if not product:
+        await update.message.reply_text(
+            "❌ *Товар не найден в базе данных.*",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return ConversationHandler.END
+
+    context.bot_data['product_cache'].invalidate(update.message.from_user.id)
 
     # Отправляем новое сообщение с обычной клавиатурой
     await update.message.reply_text(
-        f"✅ *Название товара успешно изменено на:* {new_name}",
-        reply_markup=main_menu(),
+        f"✅ *Название товара успешно изменено на:* {product.name}",
+        reply_markup=MAIN_MENU,
         parse_mode='Markdown'
     )
 
-    context.user_data.pop('editing_product_id', None)
     return ConversationHandler.END
 
 # Обработка изменения даты
+@timed_handler
 async def edit_product_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     # Это текстовое сообщение с новой датой
     date_text = update.message.text
@@ -644,7 +580,7 @@ async def edit_product_date(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if date_text == "↩️ Отмена":
         await update.message.reply_text(
             "❌ *Изменение даты отменено.*",
-            reply_markup=main_menu(),
+            reply_markup=MAIN_MENU,
             parse_mode='Markdown'
         )
         context.user_data.pop('editing_product_id', None)
@@ -655,144 +591,128 @@ async def edit_product_date(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not product_id:
         await update.message.reply_text(
             "❌ *Ошибка: товар не найден.*",
-            reply_markup=main_menu(),
+            reply_markup=MAIN_MENU,
             parse_mode='Markdown'
         )
         return ConversationHandler.END
 
-    # Преобразуем дату с коротким годом в полный формат
-    normalized_date = parse_date_with_short_year(date_text)
+    today = await user_today(context, update.message.from_user.id)
 
-    if not normalized_date:
+    try:
+        warranty_date = parse_date(date_text, today)
+    except DateFormatError:
         await update.message.reply_text(
-            "❌ *Неверный формат даты! Используйте ДД.ММ.ГГГГ или ДД.ММ.ГГ*\n\nПопробуйте еще раз:",
-            reply_markup=cancel_menu(),
+            "❌ *Неверный формат даты! Используйте ДД.ММ.ГГГГ, ДД.ММ.ГГ или +6м / +1г*\n\nПопробуйте еще раз:",
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return EDIT_DATE
-
-    # Проверка формата даты
-    if not re.match(r'^\d{2}\.\d{2}\.\d{4}$', normalized_date):
+    except InvalidDateError:
         await update.message.reply_text(
-            "❌ *Неверный формат даты! Используйте ДД.ММ.ГГГГ или ДД.ММ.ГГ*\n\nПопробуйте еще раз:",
-            reply_markup=cancel_menu(),
+            "❌ *Неверная дата! Проверьте правильность ввода.*\n\nПопробуйте еще раз:",
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return EDIT_DATE
 
-    try:
-        warranty_date = datetime.strptime(normalized_date, '%d.%m.%Y').date()
-        today = datetime.now().date()
-
-        if warranty_date <= today:
-            await update.message.reply_text(
-                "❌ *Дата должна быть в будущем!*\n\nВведите корректную дату:",
-                reply_markup=cancel_menu(),
-                parse_mode='Markdown'
-            )
-            return EDIT_DATE
-
-    except ValueError:
+    if warranty_date <= today:
         await update.message.reply_text(
-            "❌ *Неверная дата! Проверьте правильность ввода.*\n\nПопробуйте еще раз:",
-            reply_markup=cancel_menu(),
+            "❌ *Дата должна быть в будущем!*\n\nВведите корректную дату:",
+            reply_markup=CANCEL_MENU,
             parse_mode='Markdown'
         )
         return EDIT_DATE
 
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
+    db = context.bot_data['db']
 
-    cursor.execute(
-        'UPDATE products SET warranty_date = ? WHERE id = ?',
-        (warranty_date.strftime('%Y-%m-%d'), product_id)
+    product = await db.write(
+        change_warranty, product_id, update.message.from_user.id,
+        warranty_date.toordinal(), next_reminder_day(warranty_date.toordinal(), today.toordinal())
     )
-    conn.commit()
+    context.user_data.pop('editing_product_id', None)
+
+    if not product:
+        await update.message.reply_text(
+            "❌ *Товар не найден в базе данных.*",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return ConversationHandler.END
+
+    context.bot_data['product_cache'].invalidate(update.message.from_user.id)
+    await schedule_reminders(context, update.message.from_user.id, product.id)
 
     # Отправляем новое сообщение с обычной клавиатурой
     await update.message.reply_text(
-        f"✅ *Дата гарантии успешно изменена на:* {warranty_date.strftime('%d.%m.%Y')}",
-        reply_markup=main_menu(),
+        f"✅ *Дата гарантии успешно изменена на:* "
+        f"{datetime.fromordinal(product.warranty_day).strftime('%d.%m.%Y')}",
+        reply_markup=MAIN_MENU,
         parse_mode='Markdown'
     )
 
-    context.user_data.pop('editing_product_id', None)
     return ConversationHandler.END
 # Показать товары из callback (для кнопки "Назад")
 
 # Функция отмены редактирования для ConversationHandler
+@timed_handler
 async def cancel_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.pop('editing_product_id', None)
     await update.message.reply_text(
         "❌ *Редактирование отменено.*",
-        reply_markup=main_menu(),
+        reply_markup=MAIN_MENU,
         parse_mode='Markdown'
     )
     return ConversationHandler.END
 
+@timed_handler
 async def show_products_from_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
 
-    user_id = query.from_user.id
-    conn = context.bot_data['db_connection']
-    cursor = conn.cursor()
-
-    cursor.execute(
-        'SELECT id, product_name, warranty_date FROM products WHERE user_id = ? ORDER BY warranty_date',
-        (user_id,)
-    )
-    products = cursor.fetchall()
+    message, keyboard = await get_product_list(context, query.from_user.id)
 
-    if not products:
+    if not message:
         await query.edit_message_text(
-            "*📭 У вас пока нет добавленных товаров.*\n\n*Нажмите* \"📦 Добавить товар\"*, чтобы добавить первый товар.*",
-            reply_markup=main_menu(),
+            EMPTY_LIST_TEXT,
+            reply_markup=MAIN_MENU,
             parse_mode='Markdown'
         )
         return
 
-    today = datetime.now().date()
-    message = "*📋 Ваши товары:*\n\n"
-
-    keyboard = []
+    await query.edit_message_text(
+        message,
+        reply_markup=keyboard,
+        parse_mode='Markdown'
+    )
 
-    for product in products:
-        product_id, product_name, warranty_date_str = product
-        warranty_date = datetime.strptime(warranty_date_str, '%Y-%m-%d').date()
-        days_left = (warranty_date - today).days
 
-        if days_left < 0:
-            status = "❌ Просрочено"
-        elif days_left == 0:
-            status = "⚠️ Заканчивается сегодня"
-        elif days_left <= 7:
-            status = "🔥 Срочно"
-        elif days_left <= 30:
-            status = "⚠️ Скоро закончится"
-        else:
-            status = None
+# Листание списка товаров: сообщение редактируется на месте
+@timed_handler
+async def show_products_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
 
-        message += f"📦 *{product_name}*\n"
-        message += f"📅 *До:* {warranty_date.strftime('%d.%m.%Y')}\n"
-        message += f"⏳ *Осталось:* {days_left} дней\n"
-        if status:
-            message += f"📊 *{status}*\n"
-        message += "\n"
+    _, direction, page, warranty_day, product_id = query.data.split('_')
+    message, keyboard = await get_product_list(
+        context, query.from_user.id, int(page), direction, (int(warranty_day), int(product_id))
+    )
 
-        display_name = product_name[:30] + "..." if len(product_name) > 30 else product_name
-        keyboard.append([
-            InlineKeyboardButton(f"✏️ {display_name}", callback_data=f"edit_{product_id}")
-        ])
+    # Товары с той стороны могли удалить - тогда показываем начало списка
+    if not message:
+        message, keyboard = await get_product_list(context, query.from_user.id)
+    if not message:
+        await query.edit_message_text("*📭 У вас пока нет добавленных товаров.*", parse_mode='Markdown')
+        return
 
     await query.edit_message_text(
         message,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=keyboard,
         parse_mode='Markdown'
     )
 
 
 # Обработка текстовых сообщений (главное меню)
+@timed_handler
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text = update.message.text
 
@@ -803,25 +723,336 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     else:
         await update.message.reply_text(
             "Используйте кнопки меню для навигации",
-            reply_markup=main_menu()
+            reply_markup=MAIN_MENU
+        )
+
+
+def render_settings(settings):
+    timezone_name, hour = settings
+    return (
+        f"*⚙️ Настройки напоминаний*\n\n"
+        f"🌍 *Часовой пояс:* `{timezone_name}`\n"
+        f"⏰ *Время напоминаний:* {hour}:00\n\n"
+        f"Изменить: /timezone Europe/Moscow (или +3) и /hour 9"
+    )
+
+
+# Текущие настройки напоминаний пользователя
+@timed_handler
+async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    db = context.bot_data['db']
+    settings = await db.read(get_settings, update.message.from_user.id)
+    await update.message.reply_text(render_settings(settings), reply_markup=MAIN_MENU, parse_mode='Markdown')
+
+
+# Часовой пояс: /timezone Europe/Moscow или /timezone +3
+@timed_handler
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    timezone_name = parse_timezone(' '.join(context.args)) if context.args else None
+    if not timezone_name:
+        await update.message.reply_text(
+            "❌ *Неизвестный часовой пояс!*\n\nУкажите название, например /timezone Europe/Moscow, "
+            "или смещение от UTC, например /timezone +3",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
         )
+        return
+
+    db = context.bot_data['db']
+    settings = await db.write(update_settings, update.message.from_user.id, timezone_name)
+    context.bot_data['timezone_cache'].put(update.message.from_user.id, timezone_name)
+    await schedule_reminders(context, update.message.from_user.id)
+    await update.message.reply_text(render_settings(settings), reply_markup=MAIN_MENU, parse_mode='Markdown')
+
+
+# Час рассылки по местному времени: /hour 9
+@timed_handler
+async def hour_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    hour = context.args[0] if context.args else ''
+    if not hour.isdigit() or not 0 <= int(hour) <= 23:
+        await update.message.reply_text(
+            "❌ *Укажите час от 0 до 23,* например /hour 9",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return
+
+    db = context.bot_data['db']
+    settings = await db.write(update_settings, update.message.from_user.id, None, int(hour))
+    await schedule_reminders(context, update.message.from_user.id)
+    await update.message.reply_text(render_settings(settings), reply_markup=MAIN_MENU, parse_mode='Markdown')
+
+
+# Архив давно просроченных товаров
+@timed_handler
+async def archive_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    db = context.bot_data['db']
+    products, total = await db.read(get_archive, update.message.from_user.id, config.PRODUCT_PAGE_SIZE)
+
+    if not products:
+        await update.message.reply_text(
+            "*🗄 В архиве пока пусто.*\n\n"
+            f"Товары попадают сюда через {config.ARCHIVE_AFTER_DAYS} дней после окончания гарантии.",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return
+
+    await update.message.reply_text(render_archive(products, total), reply_markup=MAIN_MENU, parse_mode='Markdown')
+
+
+# Подсказка по импорту из файла
+@timed_handler
+async def import_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text(
+        "*📥 Импорт товаров из файла*\n\n"
+        "Отправьте CSV или TSV файл, по товару в строке:\n"
+        "`название;дата;категория;магазин`\n\n"
+        "Категория и магазин необязательны, разделитель - точка с запятой, запятая или табуляция. "
+        "Дата в том же формате, что и при добавлении: ДД.ММ.ГГ, ДД.ММ.ГГГГ или +1г.",
+        reply_markup=MAIN_MENU,
+        parse_mode='Markdown'
+    )
+
+
+# Импорт товаров из присланного CSV/TSV файла
+@timed_handler
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    document = update.message.document
+
+    if document.file_size and document.file_size > config.IMPORT_MAX_FILE_SIZE:
+        await update.message.reply_text(
+            f"❌ *Файл слишком большой!* Максимум {config.IMPORT_MAX_FILE_SIZE // (1024 * 1024)} МБ.",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return
+
+    user_id = update.message.from_user.id
+    db = context.bot_data['db']
+
+    # Файл скачиваем на диск и читаем построчно, чтобы не держать его в памяти
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        file = await context.bot.get_file(document.file_id)
+        await file.download_to_drive(path)
+        result = await db.write(import_products, path, user_id, await user_today(context, user_id))
+    except Exception as e:
+        # Импорт идет одной транзакцией, поэтому при ошибке ничего не добавлено
+        logger.error(f"Ошибка импорта у пользователя {user_id}: {e}")
+        await update.message.reply_text(
+            "❌ *Не удалось импортировать файл.* Ни один товар не добавлен, попробуйте еще раз.",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return
+    finally:
+        os.remove(path)
+
+    if result.added:
+        context.bot_data['product_cache'].invalidate(user_id)
+        await schedule_reminders(context, user_id)
+    logger.info(f"Импорт у пользователя {user_id}: добавлено {result.added}, ошибок {result.error_count}")
+
+    await update.message.reply_text(
+        render_import_result(result),
+        reply_markup=MAIN_MENU,
+        parse_mode='Markdown'
+    )
+
+
+# Выгрузка товаров файлом: /export или /export json
+@timed_handler
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    fmt = context.args[0].lower() if context.args else 'csv'
+    if fmt not in EXPORT_FORMATS:
+        await update.message.reply_text(
+            f"❌ *Неизвестный формат!* Доступны: {', '.join(EXPORT_FORMATS)}",
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+        return
+
+    user_id = update.message.from_user.id
+    db = context.bot_data['db']
+
+    # Пишем во временный файл по мере чтения из базы. При отправке PTB читает файл в память
+    # целиком, поэтому его размер ограничен EXPORT_MAX_FILE_SIZE
+    fd, path = tempfile.mkstemp(suffix=f'.{fmt}')
+    os.close(fd)
+    try:
+        count, total = await db.read(export_products, path, user_id, fmt)
+        if count:
+            caption = f"📤 Товаров: {count}"
+            if count < total:
+                caption += (f" из {total}: файл ограничен {config.EXPORT_MAX_FILE_SIZE // (1024 * 1024)} МБ, "
+                            f"выгружены первые по дате окончания гарантии")
+            with open(path, 'rb') as f:
+                await context.bot.send_document(
+                    chat_id=user_id,
+                    document=f,
+                    filename=f"products_{(await user_today(context, user_id)).isoformat()}.{fmt}",
+                    caption=caption,
+                    reply_markup=MAIN_MENU
+                )
+    finally:
+        os.remove(path)
+
+    if not count:
+        await update.message.reply_text(
+            EMPTY_LIST_TEXT,
+            reply_markup=MAIN_MENU,
+            parse_mode='Markdown'
+        )
+
+
+# Раз в сутки сбрасываем кэш списков. Записи прошедших дней и так не используются
+# (ключ - местный день пользователя), сброс освобождает память
+async def clear_product_cache(context: ContextTypes.DEFAULT_TYPE):
+    cache = context.bot_data['product_cache']
+    logger.info(f"Кэш списков товаров за день: {cache.stats()}")
+    cache.clear()
+
+
+# Эндпоинт метрик Prometheus (если задан METRICS_PORT)
+async def start_metrics(application: Application) -> None:
+    if config.METRICS_PORT:
+        # Процессы вебхука слушают соседние порты: METRICS_PORT + номер процесса
+        index, _ = application.bot_data['process']
+        application.bot_data['metrics_server'] = await start_metrics_server(
+            config.METRICS_LISTEN, config.METRICS_PORT + index, config.METRICS_PATH
+        )
+
+
+# Загружает предстоящие напоминания в колесо (потоково, в пуле читателей)
+async def load_reminder_wheel(application: Application) -> None:
+    wheel = ReminderWheel()
+    count = await application.bot_data['db'].read(load_wheel, wheel, datetime.now(timezone.utc))
+    application.bot_data['reminder_wheel'] = wheel
+    logger.info(f"Колесо напоминаний: загружено {count} товаров, {wheel.stats()}")
+
+
+# Рассылка и обслуживание базы идут только в первом процессе (при нескольких процессах вебхука)
+def runs_jobs(application: Application):
+    index, _ = application.bot_data['process']
+    return index == 0
+
+
+# Запуск служб после инициализации бота
+async def post_init(application: Application) -> None:
+    await start_metrics(application)
+    if not runs_jobs(application):
+        return
+    if config.REMINDER_IN_BOT and config.REMINDER_WHEEL and config.REMINDER_SHARDS == 1:
+        await load_reminder_wheel(application)
+    if config.REMINDER_IN_BOT:
+        application.job_queue.run_once(resume_interrupted_reminders, when=0, name="resume_reminders")
+
+
+# Ночное обслуживание базы: архив просроченных товаров, vacuum, статистика
+async def maintain_db(context: ContextTypes.DEFAULT_TYPE):
+    archived, users, free_pages = await run_maintenance(
+        context.bot_data['db'], datetime.now().date().toordinal()
+    )
+    cache = context.bot_data['product_cache']
+    for user_id in users:
+        cache.invalidate(user_id)
+    logger.info(f"Обслуживание базы: в архив {archived} товаров, свободных страниц {free_pages}")
+
+
+# При остановке бота закрываем эндпоинт метрик и базу, дописав все изменения
+async def close_db(application: Application) -> None:
+    metrics_server = application.bot_data.pop('metrics_server', None)
+    if metrics_server:
+        await metrics_server.drain(0)
+    await application.bot_data['db'].close()
+
+
+# Шард в виде i/N -> (номер с нуля, всего)
+def parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("номер задается как i/N, например 1/4")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("номер должен быть от 1 до N")
+    return index - 1, count
+
+
+# Параметры запуска
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бот для напоминаний об окончании гарантии')
+    parser.add_argument(
+        '--mode', choices=('polling', 'webhook'), default=config.BOT_MODE,
+        help='получение обновлений: long polling или вебхук с локальным HTTP сервером'
+    )
+    parser.add_argument(
+        '--shard', metavar='i/N', type=parse_shard,
+        help='не запускать бота, а один раз разослать напоминания текущего часа шарду i из N (нумерация с 1)'
+    )
+    parser.add_argument(
+        '--process', metavar='i/N', type=parse_shard, default=(0, 1),
+        help='процесс вебхука i из N: пользователи делятся между процессами по user_id (нумерация с 1)'
+    )
+    args = parser.parse_args()
+    if args.process[1] > 1 and args.mode != 'webhook':
+        parser.error('несколько процессов поддерживаются только в режиме webhook')
+    return args
 
 
 # Основная функция
 def main() -> None:
+    args = parse_args()
+
+    # Отдельный запуск рассылки одного шарда (например, из cron на нескольких машинах)
+    if args.shard:
+        init_db().close()
+        run_shard(*args.shard, datetime.now(timezone.utc))
+        return
+
+    # Инициализация базы данных: схема создается синхронно при старте,
+    # дальше обработчики работают с базой только через асинхронный слой
+    init_db().close()
+    db = Database()
+
     # Создаем Application с правильной инициализацией
     application = (
         Application.builder()
-        .token("8576950098:AAEae5qOnqtWCoIFgpWA43ILZfjK7EktmNU")  # ЗАМЕНИТЕ НА ВАШ ТОКЕН
+        .token(config.BOT_TOKEN)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .rate_limiter(OutgoingLimiter())
+        .concurrent_updates(PerUserUpdateProcessor())
+        .persistence(SQLitePersistence(db, process=args.process))
+        .post_init(post_init)
+        .post_shutdown(close_db)
         .build()
     )
 
-    # Инициализация базы данных
-    conn = init_db()
-    application.bot_data['db_connection'] = conn
+    application.bot_data['db'] = db
+    application.bot_data['process'] = args.process
+    application.bot_data['timezone_cache'] = TimezoneCache()
+    # Кэш списков живет в памяти процесса. В режиме вебхука по умолчанию выключен: товары
+    # меняет не только процесс-владелец пользователя (архив в ночном обслуживании идет
+    # в первом процессе), поэтому список всегда читается из базы
+    if args.mode == 'webhook' and not config.WEBHOOK_PRODUCT_CACHE:
+        application.bot_data['product_cache'] = ProductListCache(max_size=0)
+    else:
+        application.bot_data['product_cache'] = ProductListCache()
 
     # Добавляем обработчики
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("settings", settings_command))
+    application.add_handler(CommandHandler("timezone", timezone_command))
+    application.add_handler(CommandHandler("hour", hour_command))
+    application.add_handler(CommandHandler("archive", archive_command))
+    application.add_handler(CommandHandler("import", import_help))
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("tsv")
+        | filters.Document.FileExtension("txt"),
+        import_document
+    ))
 
     # ConversationHandler для добавления товара
     add_conv_handler = ConversationHandler(
@@ -831,7 +1062,9 @@ def main() -> None:
             ADD_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_product_date)],
         },
         fallbacks=[MessageHandler(filters.Text(["↩️ Отмена"]), cancel_add)],
-        per_message=False  # Явно указываем для избежания предупреждения
+        per_message=False,  # Явно указываем для избежания предупреждения
+        name="add_product",
+        persistent=True  # состояние переживает перезапуск бота
     )
 
     # ConversationHandler для редактирования товара
@@ -844,7 +1077,9 @@ def main() -> None:
         fallbacks=[
             MessageHandler(filters.Text(["↩️ Отмена"]), cancel_edit),  # Используем новую функцию
         ],
-        per_message=False
+        per_message=False,
+        name="edit_product",
+        persistent=True
     )
 
     application.add_handler(add_conv_handler)
@@ -856,20 +1091,42 @@ def main() -> None:
     application.add_handler(CallbackQueryHandler(cancel_delete_handler, pattern=r"^cancel_delete$"))
     application.add_handler(CallbackQueryHandler(confirm_delete_handler, pattern=r"^confirm_delete$"))
     application.add_handler(CallbackQueryHandler(show_products_from_callback, pattern=r"^back_to_list$"))
+    application.add_handler(CallbackQueryHandler(show_products_page, pattern=r"^list_(next|prev)_\d+_\d+_\d+$"))
 
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
 
-    # Запускаем ежедневные напоминания в 13:00
+    # Напоминания рассылаются в начале каждого часа своей корзине пользователей
+    # (если рассылку запускают снаружи через --shard, в боте ее отключают)
+    main_process = runs_jobs(application)
+    if config.REMINDER_IN_BOT and main_process:
+        now = datetime.now(timezone.utc)
+        application.job_queue.run_repeating(
+            send_reminders,
+            interval=timedelta(hours=1),
+            first=now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1),
+            name="hourly_reminders"
+        )
+
     application.job_queue.run_daily(
-        send_daily_reminders,
-        time=time(hour=13, minute=0),  # 13:00 по времени сервера
-        name="daily_reminders"
+        clear_product_cache,
+        time=time(hour=0, minute=0),
+        name="clear_product_cache"
     )
 
-    logger.info("Бот запущен с ежедневными напоминаниями в 13:00")
+    if main_process:
+        application.job_queue.run_daily(
+            maintain_db,
+            time=time(hour=config.MAINTENANCE_HOUR, minute=30),
+            name="maintain_db"
+        )
+
+    logger.info(f"Бот запущен, напоминания по умолчанию в {config.REMINDER_HOUR}:00 ({config.DEFAULT_TIMEZONE})")
 
     # Запускаем бота
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if args.mode == 'webhook':
+        run_webhook(application, process=args.process)
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,98 @@
+# Генератор синтетической базы: пользователи, товары и сроки гарантии с заданным распределением.
+# Запуск из корня проекта: python -m benchmarks.datagen --users 10000 --products 100000
+import argparse
+import os
+import random
+from datetime import date
+
+import config
+from database import connect
+from migrations import migrate
+from reminders import REMINDER_DAYS, next_reminder_day
+
+# Распределения количества товаров у пользователя
+DISTRIBUTIONS = ('uniform', 'skewed')
+
+
+# Количество товаров у каждого пользователя, в сумме ровно products.
+# uniform - примерно поровну, skewed - у немногих пользователей большая часть товаров (Парето).
+def products_per_user(users, products, distribution, rng):
+    if distribution == 'uniform':
+        weights = [1.0] * users
+    else:
+        weights = [rng.paretovariate(1.2) for _ in range(users)]
+    total = sum(weights)
+    counts = [int(products * weight / total) for weight in weights]
+    for i in rng.sample(range(users), products - sum(counts)):
+        counts[i] += 1
+    return counts
+
+
+# Строки products: due - доля товаров, по которым сегодня уходит напоминание,
+# expired - доля уже просроченных, остальные равномерно на horizon дней вперед
+def generate_rows(users, products, distribution='uniform', due=0.05, expired=0.1, horizon=730, seed=1):
+    rng = random.Random(seed)
+    today_day = date.today().toordinal()
+    counts = products_per_user(users, products, distribution, rng)
+    number = 0
+    for user_id, count in enumerate(counts, start=1):
+        for _ in range(count):
+            number += 1
+            roll = rng.random()
+            if roll < due:
+                warranty_day = today_day + rng.choice(REMINDER_DAYS)
+            elif roll < due + expired:
+                warranty_day = today_day - rng.randrange(1, 365)
+            else:
+                warranty_day = today_day + rng.randrange(1, horizon)
+            yield (
+                user_id, f'Товар {number}', warranty_day,
+                next_reminder_day(warranty_day, today_day)
+            )
+
+
+# Создает базу по пути path (схема через migrate) и заполняет ее; возвращает число товаров
+def generate(path, users, products, distribution='uniform', due=0.05, expired=0.1, horizon=730,
+             seed=1, profile=None):
+    conn = connect(path, profile)
+    migrate(conn)
+    conn.executemany(
+        'INSERT INTO products (user_id, product_name, warranty_date, next_reminder) VALUES (?, ?, ?, ?)',
+        generate_rows(users, products, distribution, due, expired, horizon, seed)
+    )
+    conn.commit()
+    count = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор синтетической базы товаров')
+    parser.add_argument('--db', default=config.DB_PATH, help='путь к базе (по умолчанию DB_PATH)')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform',
+                        help='товаров на пользователя: поровну или с длинным хвостом')
+    parser.add_argument('--due', type=float, default=0.05, help='доля товаров с напоминанием сегодня')
+    parser.add_argument('--expired', type=float, default=0.1, help='доля просроченных товаров')
+    parser.add_argument('--horizon', type=int, default=730, help='на сколько дней вперед разбросаны сроки')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--force', action='store_true', help='удалить существующую базу')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} уже существует, добавьте --force, чтобы перезаписать")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    count = generate(
+        args.db, args.users, args.products, args.distribution,
+        args.due, args.expired, args.horizon, args.seed
+    )
+    print(f"{args.db}: {count} товаров у {args.users} пользователей ({args.distribution})")
+
+
+if __name__ == '__main__':
+    main()
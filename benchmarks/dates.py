@@ -0,0 +1,81 @@
+# Разбор дат: сверка с прежним разбором и скорость.
+# Запуск из корня проекта: python -m benchmarks.dates
+import argparse
+import random
+import re
+from datetime import date, datetime
+from timeit import timeit
+
+from dates import DateFormatError, InvalidDateError, parse_date
+
+
+# Прежний разбор (parse_date_with_short_year + проверка формата + strptime из обработчиков)
+def legacy_parse(date_text):
+    if re.match(r'^\d{1,2}\.\d{1,2}\.\d{2}$', date_text):
+        parts = date_text.split('.')
+        normalized = f"{parts[0].zfill(2)}.{parts[1].zfill(2)}.20{parts[2]}"
+    elif re.match(r'^\d{1,2}\.\d{1,2}\.\d{4}$', date_text):
+        parts = date_text.split('.')
+        normalized = f"{parts[0].zfill(2)}.{parts[1].zfill(2)}.{parts[2]}"
+    else:
+        return 'format'
+    if not re.match(r'^\d{2}\.\d{2}\.\d{4}$', normalized):
+        return 'format'
+    try:
+        return datetime.strptime(normalized, '%d.%m.%Y').date()
+    except ValueError:
+        return 'invalid'
+
+
+def current_parse(date_text):
+    try:
+        return parse_date(date_text)
+    except DateFormatError:
+        return 'format'
+    except InvalidDateError:
+        return 'invalid'
+
+
+def random_input(rng):
+    kind = rng.random()
+    if kind < 0.6:
+        # Похоже на дату: случайные числа нужной и чуть неправильной длины
+        parts = [str(rng.randrange(0, 40)), str(rng.randrange(0, 15)), str(rng.choice([rng.randrange(100), rng.randrange(10000)]))]
+        if rng.random() < 0.3:
+            parts = [p.zfill(2) for p in parts]
+        return '.'.join(parts[:rng.choice([2, 3, 3, 3, 4])] + (['1'] if rng.random() < 0.05 else []))
+    # Произвольная строка из цифр и точек
+    return ''.join(rng.choice('0123456789.') for _ in range(rng.randrange(12)))
+
+
+# Свойство: на всех вводах старого формата новый разбор дает тот же результат
+def check_equivalence(samples, seed):
+    rng = random.Random(seed)
+    for _ in range(samples):
+        text = random_input(rng)
+        expected, actual = legacy_parse(text), current_parse(text)
+        if expected != actual:
+            raise AssertionError(f"{text!r}: было {expected!r}, стало {actual!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка и скорость разбора дат')
+    parser.add_argument('--samples', type=int, default=200_000, help='случайных вводов для сверки')
+    parser.add_argument('--repeat', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    check_equivalence(args.samples, args.seed)
+    print(f"Сверка с прежним разбором: {args.samples} случайных вводов совпали")
+
+    today = date.today()
+    for text in ('30.12.25', '1.1.2027', '31.02.25', 'завтра'):
+        legacy = timeit(lambda: legacy_parse(text), number=args.repeat) * 1e6 / args.repeat
+        current = timeit(lambda: current_parse(text), number=args.repeat) * 1e6 / args.repeat
+        print(f"  {text!r:>12}: было {legacy:5.2f} мкс, стало {current:5.2f} мкс")
+    relative = timeit(lambda: parse_date('+6м', today), number=args.repeat) * 1e6 / args.repeat
+    print(f"  {'+6м':>12}: {relative:5.2f} мкс")
+
+
+if __name__ == '__main__':
+    main()
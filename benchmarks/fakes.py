@@ -0,0 +1,106 @@
+# Подделки Telegram для бенчмарков: бот без сети, сообщения и нажатия кнопок.
+# FakeBot записывает все вызовы, добавляет задержку сети и иногда отвечает 429, как Telegram.
+import asyncio
+import random
+import types
+from time import perf_counter
+
+from telegram.error import RetryAfter
+
+from cache import ProductListCache, TimezoneCache
+
+
+class FakeBot:
+    def __init__(self, latency=0.05, jitter=0.02, flood_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency  # средняя задержка одного запроса, секунд
+        self.jitter = jitter  # разброс задержки, секунд
+        self.flood_rate = flood_rate  # доля запросов, на которые приходит 429
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = []
+        self.latencies = []  # длительность каждого запроса, секунд
+        self.floods = 0
+
+    async def _request(self, method, kwargs):
+        started = perf_counter()
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.latencies.append(perf_counter() - started)
+        if self.flood_rate and self.random.random() < self.flood_rate:
+            self.floods += 1
+            raise RetryAfter(self.retry_after)
+        self.calls.append((method, kwargs))
+
+    async def send_message(self, **kwargs):
+        await self._request('send_message', kwargs)
+
+    async def edit_message_text(self, **kwargs):
+        await self._request('edit_message_text', kwargs)
+
+    async def delete_message(self, **kwargs):
+        await self._request('delete_message', kwargs)
+
+    async def answer_callback_query(self, **kwargs):
+        await self._request('answer_callback_query', kwargs)
+
+    # Сколько раз вызывался каждый метод
+    def counts(self):
+        result = {}
+        for method, _ in self.calls:
+            result[method] = result.get(method, 0) + 1
+        return result
+
+
+# Входящее текстовое сообщение; ответы уходят через FakeBot
+class FakeMessage:
+    def __init__(self, bot, user_id, text):
+        self.bot = bot
+        self.text = text
+        self.from_user = types.SimpleNamespace(id=user_id)
+
+    async def reply_text(self, text, **kwargs):
+        await self.bot.send_message(chat_id=self.from_user.id, text=text, **kwargs)
+
+
+# Нажатие инлайн-кнопки
+class FakeCallbackQuery:
+    def __init__(self, bot, user_id, data):
+        self.bot = bot
+        self.data = data
+        self.from_user = types.SimpleNamespace(id=user_id)
+
+    async def answer(self):
+        await self.bot.answer_callback_query(callback_query_id=self.data)
+
+    async def edit_message_text(self, text, **kwargs):
+        await self.bot.edit_message_text(chat_id=self.from_user.id, text=text, **kwargs)
+
+    async def delete_message(self):
+        await self.bot.delete_message(chat_id=self.from_user.id)
+
+
+def message_update(bot, user_id, text):
+    return types.SimpleNamespace(
+        message=FakeMessage(bot, user_id, text),
+        callback_query=None,
+        effective_user=types.SimpleNamespace(id=user_id)
+    )
+
+
+def callback_update(bot, user_id, data):
+    return types.SimpleNamespace(
+        message=None,
+        callback_query=FakeCallbackQuery(bot, user_id, data),
+        effective_user=types.SimpleNamespace(id=user_id)
+    )
+
+
+# Те же bot_data, что готовит Mbot.main
+def make_bot_data(db, cache=None):
+    return {'db': db, 'product_cache': cache or ProductListCache(), 'timezone_cache': TimezoneCache()}
+
+
+# Контекст обработчика: bot_data общие, user_data у каждого диалога свои
+def make_context(bot, bot_data, user_data=None):
+    return types.SimpleNamespace(bot=bot, bot_data=bot_data, user_data={} if user_data is None else user_data)
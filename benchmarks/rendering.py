@@ -0,0 +1,69 @@
+# Стоимость отрисовки товаров в микросекундах на товар.
+# Запуск из корня проекта: python -m benchmarks.rendering
+import argparse
+import random
+from datetime import date, datetime
+from timeit import timeit
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from rendering import render_product_card, render_product_list
+
+
+# Прежняя отрисовка списка (до rendering.py) - для сравнения: текстовые даты, strptime, +=
+def legacy_product_list(products, today):
+    message = "*📋 Ваши товары:*\n\n"
+    keyboard = []
+    for product_id, product_name, warranty_date_str in products:
+        warranty_date = datetime.strptime(warranty_date_str, '%Y-%m-%d').date()
+        days_left = (warranty_date - today).days
+        if days_left < 0:
+            status = "❌ Просрочено"
+        elif days_left == 0:
+            status = "⚠️ Заканчивается сегодня"
+        elif days_left <= 7:
+            status = "🔥 Срочно"
+        elif days_left <= 30:
+            status = "⚠️ Скоро закончится"
+        else:
+            status = None
+        message += f"📦 *{product_name}*\n"
+        message += f"📅 *До:* {warranty_date.strftime('%d.%m.%Y')}\n"
+        message += f"⏳ *Осталось:* {days_left} дней\n"
+        if status:
+            message += f"📊 *{status}*\n"
+        message += "\n"
+        display_name = product_name[:30] + "..." if len(product_name) > 30 else product_name
+        keyboard.append([InlineKeyboardButton(f"✏️ {display_name}", callback_data=f"edit_{product_id}")])
+    return message, InlineKeyboardMarkup(keyboard)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Стоимость отрисовки товаров')
+    parser.add_argument('--products', type=int, default=10, help='товаров в одном списке')
+    parser.add_argument('--repeat', type=int, default=20_000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    today = date.today()
+    today_day = today.toordinal()
+    days = [today_day + random.randrange(-30, 400) for _ in range(args.products)]
+    products = [(i, f'Товар номер {i}', day) for i, day in enumerate(days)]
+    legacy_products = [(i, name, date.fromordinal(day).isoformat()) for i, name, day in products]
+
+    per_product = 1e6 / (args.repeat * args.products)
+    legacy = timeit(lambda: legacy_product_list(legacy_products, today), number=args.repeat) * per_product
+    current = timeit(
+        lambda: InlineKeyboardMarkup(render_product_list(products, today_day, "*📋 Ваши товары:*\n\n")[1]),
+        number=args.repeat
+    ) * per_product
+    card = timeit(lambda: render_product_card('Товар', days[0], today_day), number=args.repeat) * 1e6 / args.repeat
+
+    print(f"Список из {args.products} товаров, {args.repeat} повторов")
+    print(f"  прежняя отрисовка: {legacy:6.2f} мкс/товар")
+    print(f"  rendering.py:      {current:6.2f} мкс/товар")
+    print(f"  карточка товара:   {card:6.2f} мкс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+# Сценарии работы бота на синтетической базе без сети: рассылка, список товаров,
+# добавление, редактирование и удаление. Для каждого - пропускная способность и перцентили задержки.
+# heavy_chat - рассылка, где у одного пользователя много напоминаний: остальные не должны его ждать.
+# updates_serial / updates_concurrent - поток обновлений многих пользователей через процессор
+# обновлений: последовательно, как PTB по умолчанию, и параллельно с порядком по пользователю.
+# Запуск из корня проекта: python -m benchmarks.scenarios --users 2000 --products 20000
+# С готовой базой: python -m benchmarks.scenarios --db warranty_bot.db (сценарии работают на копии)
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import datetime
+from time import perf_counter
+from zoneinfo import ZoneInfo
+
+from telegram.ext import SimpleUpdateProcessor
+
+import config
+import Mbot
+from benchmarks.datagen import DISTRIBUTIONS, generate
+from benchmarks.fakes import FakeBot, callback_update, make_bot_data, make_context, message_update
+from database import Database
+from dispatcher import ReminderDispatcher
+from migrations import migrate
+from update_processor import PerUserUpdateProcessor
+
+SCENARIOS = (
+    'reminders', 'heavy_chat', 'show_products', 'add', 'edit', 'delete', 'updates_serial', 'updates_concurrent'
+)
+
+
+# Итоги одного сценария
+class ScenarioResult:
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit  # что считаем операцией: сообщение рассылки или диалог
+        self.count = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.latencies = []
+
+    @property
+    def throughput(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    # Перцентиль задержки в секундах (p от 0 до 100)
+    def latency(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def report(self):
+        return (
+            f"{self.name:>14}: {self.count} {self.unit}, ошибок {self.errors} за {self.elapsed:.2f} с "
+            f"({self.throughput:.1f} в с), p50={self.latency(50) * 1000:.1f} мс "
+            f"p95={self.latency(95) * 1000:.1f} мс p99={self.latency(99) * 1000:.1f} мс"
+        )
+
+
+# Выполняет step(i) для i от 0 до count - 1 в concurrency параллельных задачах и замеряет каждый шаг
+async def measure(name, step, count, concurrency):
+    result = ScenarioResult(name, 'диалогов')
+    numbers = iter(range(count))
+
+    async def worker():
+        for i in numbers:
+            started = perf_counter()
+            try:
+                await step(i)
+            except Exception:
+                result.errors += 1
+            result.latencies.append(perf_counter() - started)
+            result.count += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = perf_counter() - started
+    return result
+
+
+# Рассылка целиком, как ее запускает JobQueue. Задержка - время запроса к Telegram.
+# У сгенерированных пользователей нет настроек, поэтому час по умолчанию ставим текущим
+async def bench_reminders(bot, bot_data, args):
+    config.REMINDER_SHARDS = 1
+    config.REMINDER_HOUR = datetime.now(ZoneInfo(config.DEFAULT_TIMEZONE)).hour
+    result = ScenarioResult('reminders', 'сообщений')
+    requests_before = len(bot.latencies)
+    floods_before = bot.floods
+    started = perf_counter()
+    await Mbot.send_reminders(make_context(bot, bot_data))
+    result.elapsed = perf_counter() - started
+    result.latencies = bot.latencies[requests_before:]
+    result.count = len(result.latencies)
+    result.errors = bot.floods - floods_before
+    return result
+
+
+# Рассылка с лимитом на чат, где первым в пачке идет пользователь с 20 напоминаниями.
+# Считаем только сообщения остальных пользователей; ошибка - если их рассылка заметно медленнее,
+# чем без тяжелого пользователя (значит, воркеры ждут его лимита)
+async def bench_heavy_chat(bot, bot_data, args):
+    heavy = [(0, f'Напоминание {i}', ('heavy', i)) for i in range(20)]
+    light = [(user_id, 'Напоминание', ('light', user_id)) for user_id in range(1, args.iterations + 1)]
+    chat_rate = config.REMINDER_CHAT_RATE or 1
+
+    async def light_done(messages):
+        finished = []
+        started = perf_counter()
+
+        def on_result(payload, error):
+            if payload[0] == 'light':
+                finished.append(perf_counter() - started)
+
+        dispatcher = ReminderDispatcher(bot, rate=0, chat_rate=chat_rate)
+        await dispatcher.run(messages, on_result)
+        return finished
+
+    baseline = await light_done(light)
+    finished = await light_done(heavy + light)
+
+    result = ScenarioResult('heavy_chat', 'сообщений')
+    result.latencies = finished
+    result.count = len(finished)
+    result.elapsed = max(finished, default=0.0)
+    limit = 2 * max(baseline, default=0.0) + 1 / chat_rate
+    result.errors = sum(1 for latency in finished if latency > limit)
+    return result
+
+
+async def bench_show_products(bot, bot_data, args):
+    async def step(i):
+        user_id = random.choice(args.user_ids)
+        await Mbot.show_products(message_update(bot, user_id, '📋 Мои товары'), make_context(bot, bot_data))
+
+    return await measure('show_products', step, args.iterations, args.concurrency)
+
+
+# Диалог добавления: кнопка, название, дата
+async def bench_add(bot, bot_data, args):
+    async def step(i):
+        user_id = random.choice(args.user_ids)
+        context = make_context(bot, bot_data)
+        await Mbot.add_product_start(message_update(bot, user_id, '📦 Добавить товар'), context)
+        await Mbot.add_product_name(message_update(bot, user_id, f'Новый товар {i}'), context)
+        await Mbot.add_product_date(message_update(bot, user_id, '+1г'), context)
+
+    return await measure('add', step, args.iterations, args.concurrency)
+
+
+# Диалог редактирования: карточка, новое название, снова карточка, новая дата
+async def bench_edit(bot, bot_data, args):
+    products = await sample_products(bot_data['db'], args.iterations)
+
+    async def step(i):
+        product_id, user_id = products[i % len(products)]
+        context = make_context(bot, bot_data)
+        await Mbot.edit_product_choice(callback_update(bot, user_id, f'edit_{product_id}'), context)
+        await Mbot.edit_choice_handler(callback_update(bot, user_id, 'edit_name'), context)
+        await Mbot.edit_product_name(message_update(bot, user_id, f'Переименован {i}'), context)
+        await Mbot.edit_product_choice(callback_update(bot, user_id, f'edit_{product_id}'), context)
+        await Mbot.edit_choice_handler(callback_update(bot, user_id, 'edit_date'), context)
+        await Mbot.edit_product_date(message_update(bot, user_id, '+6м'), context)
+
+    return await measure('edit', step, len(products), args.concurrency)
+
+
+# Удаление с подтверждением: карточка, кнопка удаления, подтверждение
+async def bench_delete(bot, bot_data, args):
+    products = await sample_products(bot_data['db'], args.iterations)
+
+    async def step(i):
+        product_id, user_id = products[i]
+        context = make_context(bot, bot_data)
+        await Mbot.edit_product_choice(callback_update(bot, user_id, f'edit_{product_id}'), context)
+        await Mbot.edit_choice_handler(callback_update(bot, user_id, 'delete_product'), context)
+        await Mbot.confirm_delete_handler(callback_update(bot, user_id, 'confirm_delete'), context)
+
+    return await measure('delete', step, len(products), args.concurrency)
+
+
+# Обновления одного пользователя по порядку: диалог добавления и список товаров
+UPDATE_STEPS = (
+    (Mbot.add_product_start, '📦 Добавить товар'),
+    (Mbot.add_product_name, 'Товар из потока'),
+    (Mbot.add_product_date, '+1г'),
+    (Mbot.show_products, '📋 Мои товары'),
+)
+
+
+# Поток обновлений iterations пользователей, пришедших разом вперемешку, через процессор
+# так же, как это делает Application. Задержка - от поступления до конца обработки.
+# Ошибкой считается и шаг диалога, начатый раньше, чем закончился предыдущий шаг того же пользователя
+async def bench_update_stream(name, processor, bot, bot_data, args):
+    result = ScenarioResult(name, 'обновлений')
+    user_ids = random.sample(args.user_ids, min(args.iterations, len(args.user_ids)))
+    contexts = {user_id: make_context(bot, bot_data) for user_id in user_ids}
+    next_step = dict.fromkeys(user_ids, 0)
+
+    async def handle(user_id, step, update):
+        handler, _ = UPDATE_STEPS[step]
+        if next_step[user_id] != step:
+            result.errors += 1
+        try:
+            await handler(update, contexts[user_id])
+        except Exception:
+            result.errors += 1
+        next_step[user_id] = step + 1
+        result.latencies.append(perf_counter() - started)
+        result.count += 1
+
+    # Случайное слияние: шаги одного пользователя идут по порядку, но вперемешку с чужими
+    feed = [user_id for user_id in user_ids for _ in UPDATE_STEPS]
+    random.shuffle(feed)
+    sent_steps = dict.fromkeys(user_ids, 0)
+
+    started = perf_counter()
+    async with processor:
+        tasks = []
+        for user_id in feed:
+            step = sent_steps[user_id]
+            sent_steps[user_id] += 1
+            update = message_update(bot, user_id, UPDATE_STEPS[step][1])
+            coroutine = processor.process_update(update, handle(user_id, step, update))
+            if processor.max_concurrent_updates > 1:
+                tasks.append(asyncio.create_task(coroutine))
+            else:
+                await coroutine
+        await asyncio.gather(*tasks)
+    result.elapsed = perf_counter() - started
+    return result
+
+
+async def bench_updates_serial(bot, bot_data, args):
+    return await bench_update_stream('updates_serial', SimpleUpdateProcessor(1), bot, bot_data, args)
+
+
+async def bench_updates_concurrent(bot, bot_data, args):
+    processor = PerUserUpdateProcessor(args.update_concurrency)
+    return await bench_update_stream('updates_concurrent', processor, bot, bot_data, args)
+
+
+# Случайные разные товары: [(id, user_id)]
+async def sample_products(db, count):
+    return await db.fetchall('SELECT id, user_id FROM products ORDER BY random() LIMIT ?', (count,))
+
+
+BENCHMARKS = {
+    'reminders': bench_reminders,
+    'heavy_chat': bench_heavy_chat,
+    'show_products': bench_show_products,
+    'add': bench_add,
+    'edit': bench_edit,
+    'delete': bench_delete,
+    'updates_serial': bench_updates_serial,
+    'updates_concurrent': bench_updates_concurrent,
+}
+
+
+async def run(path, args):
+    bot = FakeBot(args.latency, args.jitter, args.flood_rate, seed=args.seed)
+    db = Database(path)
+    bot_data = make_bot_data(db)
+    args.user_ids = [row[0] for row in await db.fetchall('SELECT DISTINCT user_id FROM products')] or [1]
+    try:
+        for name in args.scenarios:
+            result = await BENCHMARKS[name](bot, bot_data, args)
+            print(result.report())
+    finally:
+        await db.close()
+    print(f"Запросов к Telegram: {bot.counts()}, ответов 429: {bot.floods}")
+    print(f"Кэш списков: {bot_data['product_cache'].stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сценарии работы бота с поддельным Telegram')
+    parser.add_argument('--db', help='готовая база; по умолчанию генерируется новая')
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=1_000, help='диалогов в каждом сценарии')
+    parser.add_argument('--concurrency', type=int, default=16, help='одновременных пользователей')
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка запроса к Telegram, секунд')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='доля ответов 429')
+    parser.add_argument('--rate', type=float, help='REMINDER_RATE для рассылки (0 - без лимита)')
+    parser.add_argument('--chat-rate', type=float, help='REMINDER_CHAT_RATE для рассылки (0 - без лимита)')
+    parser.add_argument(
+        '--update-concurrency', type=int, default=config.UPDATE_CONCURRENCY,
+        help='UPDATE_CONCURRENCY для updates_concurrent'
+    )
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help='не глушить логи бота')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger('dispatcher').setLevel(logging.CRITICAL)
+    if args.rate is not None:
+        config.REMINDER_RATE = args.rate
+    if args.chat_rate is not None:
+        config.REMINDER_CHAT_RATE = args.chat_rate
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        if args.db:
+            # Сценарии меняют базу, поэтому работаем с копией
+            source = sqlite3.connect(args.db)
+            target = sqlite3.connect(path)
+            source.backup(target)
+            migrate(target)
+            source.close()
+            target.close()
+        else:
+            generate(path, args.users, args.products, args.distribution, seed=args.seed)
+        print(f"База: {args.db or f'{args.products} товаров у {args.users} пользователей'}")
+        asyncio.run(run(path, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Сравнение профилей хранения на большой базе.
+# Запуск из корня проекта: python -m benchmarks.storage_profiles --products 1000000
+import argparse
+import os
+import random
+import tempfile
+from datetime import date
+from time import perf_counter
+
+from database import STORAGE_PROFILES, connect
+from migrations import migrate
+
+def fill(conn, products, users):
+    start = date.today().toordinal()
+    migrate(conn)
+    conn.executemany(
+        'INSERT INTO products (user_id, product_name, warranty_date) VALUES (?, ?, ?)',
+        (
+            (random.randrange(users), f'Товар {i}', start + random.randrange(730))
+            for i in range(products)
+        )
+    )
+    conn.commit()
+
+
+# Одиночные INSERT/UPDATE/DELETE с коммитом после каждого, как в обработчиках
+def bench_writes(conn, count, products):
+    start = date.today().toordinal()
+    started = perf_counter()
+    for i in range(count):
+        op = i % 3
+        if op == 0:
+            conn.execute(
+                'INSERT INTO products (user_id, product_name, warranty_date) VALUES (?, ?, ?)',
+                (i, 'Новый товар', start + 365)
+            )
+        elif op == 1:
+            conn.execute('UPDATE products SET product_name = ? WHERE id = ?', ('Другое', random.randrange(1, products)))
+        else:
+            conn.execute('DELETE FROM products WHERE id = ?', (random.randrange(1, products),))
+        conn.commit()
+    return count / (perf_counter() - started)
+
+
+# Чтение карточки товара по id, как в меню управления товаром
+def bench_reads(conn, count, products):
+    started = perf_counter()
+    for _ in range(count):
+        conn.execute(
+            'SELECT product_name, warranty_date FROM products WHERE id = ?',
+            (random.randrange(1, products),)
+        ).fetchone()
+    return count / (perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение профилей хранения SQLite')
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--writes', type=int, default=3_000)
+    parser.add_argument('--reads', type=int, default=100_000)
+    parser.add_argument('--profiles', nargs='+', default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"Товаров: {args.products}, записей: {args.writes}, чтений: {args.reads}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            random.seed(1)
+            path = os.path.join(tmp, f'{profile}.db')
+            conn = connect(path, profile)
+            fill(conn, args.products, args.users)
+            writes = bench_writes(conn, args.writes, args.products)
+            reads = bench_reads(conn, args.reads, args.products)
+            conn.close()
+            print(f"{profile:>8}: запись {writes:10.0f} оп/с, чтение {reads:10.0f} оп/с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+import config
+
+
+# LRU-кэш готовых списков товаров: user_id -> (день, текст, клавиатура).
+# Запись действительна только в тот день, когда построена, потому что в списке
+# показывается количество оставшихся дней. max_size=0 - кэш выключен.
+class ProductListCache:
+    def __init__(self, max_size=None):
+        self.max_size = config.PRODUCT_CACHE_SIZE if max_size is None else max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Возвращает (текст, клавиатура) или None, если в кэше нет актуального списка.
+    # Пустой список товаров кэшируется как (None, None).
+    def get(self, user_id, day):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != day:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, user_id, day, text, keyboard):
+        if not self.max_size:
+            return
+        self._entries[user_id] = (day, text, keyboard)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Вызывается при любом изменении товаров пользователя
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# LRU-кэш часовых поясов пользователей: user_id -> часовой пояс. Нужен, чтобы узнать
+# сегодняшний день пользователя без запроса к базе (в том числе при попадании в кэш списков).
+# Пояс меняется только командой /timezone, она и обновляет запись.
+class TimezoneCache:
+    def __init__(self, max_size=None):
+        self.max_size = config.PRODUCT_CACHE_SIZE if max_size is None else max_size
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        timezone_name = self._entries.get(user_id)
+        if timezone_name is not None:
+            self._entries.move_to_end(user_id)
+        return timezone_name
+
+    def put(self, user_id, timezone_name):
+        if not self.max_size:
+            return
+        self._entries[user_id] = timezone_name
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,73 @@
+import os
+
+# Настройки бота. Значения по умолчанию можно переопределить переменными окружения.
+
+BOT_TOKEN = os.getenv('BOT_TOKEN', '8576950098:AAEae5qOnqtWCoIFgpWA43ILZfjK7EktmNU')  # ЗАМЕНИТЕ НА ВАШ ТОКЕН
+
+# Рассылка напоминаний
+REMINDER_WORKERS = int(os.getenv('REMINDER_WORKERS', '16'))  # количество параллельных отправителей
+REMINDER_RATE = float(os.getenv('REMINDER_RATE', '25'))  # сообщений в секунду на весь бот (0 - без лимита)
+REMINDER_BURST = int(os.getenv('REMINDER_BURST', '25'))  # сколько сообщений можно отправить разом
+REMINDER_CHAT_RATE = float(os.getenv('REMINDER_CHAT_RATE', '1'))  # сообщений в секунду в один чат (0 - без лимита)
+REMINDER_DIGEST = os.getenv('REMINDER_DIGEST', '0') == '1'  # одна сводка на пользователя вместо сообщения на товар
+REMINDER_BATCH = int(os.getenv('REMINDER_BATCH', '200'))  # пользователей в одной пачке рассылки
+REMINDER_MAX_ATTEMPTS = int(os.getenv('REMINDER_MAX_ATTEMPTS', '3'))  # попыток отправить одно напоминание
+REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS', '1'))  # процессов рассылки (пользователи делятся по user_id)
+REMINDER_HOUR = int(os.getenv('REMINDER_HOUR', '13'))  # час рассылки по умолчанию (местное время пользователя)
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Europe/Moscow')  # часовой пояс пользователей без настроек
+REMINDER_IN_BOT = os.getenv('REMINDER_IN_BOT', '1') == '1'  # 0 - рассылку запускают отдельно через --shard
+REMINDER_WHEEL = os.getenv('REMINDER_WHEEL', '1') == '1'  # колесо напоминаний в памяти вместо сканирования (без шардов)
+
+# Исходящие запросы к Bot API (все обработчики и рассылка)
+OUTGOING_RATE = float(os.getenv('OUTGOING_RATE', '30'))  # запросов в секунду на весь бот (0 - без лимита)
+# Сколько из OUTGOING_RATE остается обработчикам бота, пока шарды рассылают напоминания
+# (при REMINDER_IN_BOT=0 задайте боту OUTGOING_RATE с учетом шардов, запущенных через --shard)
+OUTGOING_HANDLER_RATE = float(os.getenv('OUTGOING_HANDLER_RATE', '5'))
+OUTGOING_MIN_RATE = float(os.getenv('OUTGOING_MIN_RATE', '1'))  # до скольки можно снизить лимит после RetryAfter
+OUTGOING_RECOVERY = float(os.getenv('OUTGOING_RECOVERY', '0.1'))  # прибавка к лимиту за каждый успешный запрос
+OUTGOING_MAX_RETRIES = int(os.getenv('OUTGOING_MAX_RETRIES', '3'))  # повторов при RetryAfter и сетевых ошибках
+OUTGOING_BACKOFF = float(os.getenv('OUTGOING_BACKOFF', '0.5'))  # начальная пауза перед повтором, секунд
+OUTGOING_MAX_BACKOFF = float(os.getenv('OUTGOING_MAX_BACKOFF', '30'))  # максимальная пауза перед повтором
+OUTGOING_MAX_RETRY_AFTER = float(os.getenv('OUTGOING_MAX_RETRY_AFTER', '60'))  # дольше ждать не будем, ошибка
+
+# Обработка входящих обновлений
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))  # обновлений разных пользователей одновременно
+
+# База данных
+DB_PATH = os.getenv('DB_PATH', 'warranty_bot.db')
+DB_PROFILE = os.getenv('DB_PROFILE', 'fast')  # профиль хранения: legacy, safe или fast (см. database.py)
+DB_READERS = int(os.getenv('DB_READERS', '4'))  # потоков-читателей
+DB_WRITE_BATCH = int(os.getenv('DB_WRITE_BATCH', '100'))  # операций записи в одном коммите
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))  # через сколько дней после окончания гарантии товар уходит в архив
+ARCHIVE_BATCH = int(os.getenv('ARCHIVE_BATCH', '500'))  # товаров, переносимых в архив за одну запись
+VACUUM_PAGES = int(os.getenv('VACUUM_PAGES', '0'))  # страниц, возвращаемых файлу за обслуживание (0 - все свободные)
+MAINTENANCE_HOUR = int(os.getenv('MAINTENANCE_HOUR', '4'))  # час обслуживания базы по времени сервера
+PERSISTENCE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '30'))  # секунд между сохранениями состояния диалогов
+
+# Список товаров
+PRODUCT_PAGE_SIZE = int(os.getenv('PRODUCT_PAGE_SIZE', '10'))  # товаров на одной странице
+PRODUCT_CACHE_SIZE = int(os.getenv('PRODUCT_CACHE_SIZE', '10000'))  # пользователей в кэше (0 - без кэша)
+WEBHOOK_PRODUCT_CACHE = os.getenv('WEBHOOK_PRODUCT_CACHE', '0') == '1'  # кэш списков в режиме вебхука
+
+# Импорт и выгрузка товаров (CSV/TSV, JSON)
+IMPORT_BATCH = int(os.getenv('IMPORT_BATCH', '1000'))  # строк в одном INSERT
+IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', '20'))  # сколько ошибок по строкам показывать
+IMPORT_MAX_FILE_SIZE = int(os.getenv('IMPORT_MAX_FILE_SIZE', str(20 * 1024 * 1024)))  # Bot API отдает файлы до 20 МБ
+EXPORT_BATCH = int(os.getenv('EXPORT_BATCH', '1000'))  # строк, читаемых из курсора за раз
+EXPORT_MAX_FILE_SIZE = int(os.getenv('EXPORT_MAX_FILE_SIZE', str(10 * 1024 * 1024)))  # файл выгрузки отправляется из памяти
+
+# Способ получения обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')  # адрес локального HTTP сервера
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # сверяется с заголовком X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # публичный адрес для setWebhook (пусто - не регистрировать)
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '10'))  # секунд на завершение запросов при остановке
+WEBHOOK_PEERS = os.getenv('WEBHOOK_PEERS', '')  # адреса процессов через запятую по номеру (пусто - WEBHOOK_PORT + i)
+WEBHOOK_FORWARD_TIMEOUT = float(os.getenv('WEBHOOK_FORWARD_TIMEOUT', '10'))  # секунд на пересылку обновления владельцу
+
+# Метрики в формате Prometheus
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 - эндпоинт не запускать
+METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from time import perf_counter
+
+import config
+from metrics import DB_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+# Профили хранения: прагмы SQLite и размер кэша подготовленных запросов.
+# legacy - настройки по умолчанию (журнал отката, полная синхронизация), как было раньше.
+STORAGE_PROFILES = {
+    'legacy': {
+        'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'},
+        'cached_statements': 128,
+    },
+    # WAL с полной синхронизацией: коммит не теряется даже при отключении питания
+    'safe': {
+        'pragmas': {
+            'journal_mode': 'wal',
+            'synchronous': 'full',
+            'cache_size': -32000,
+            'mmap_size': 128 * 1024 * 1024,
+            'temp_store': 'memory',
+        },
+        'cached_statements': 256,
+    },
+    # WAL с synchronous=NORMAL: при отключении питания можно потерять последние коммиты,
+    # но база не портится. fsync только при чекпоинте
+    'fast': {
+        'pragmas': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'memory',
+        },
+        'cached_statements': 256,
+    },
+}
+
+# Как SQLite возвращает значения прагм при чтении
+_PRAGMA_VALUES = {
+    'synchronous': {'off': 0, 'normal': 1, 'full': 2, 'extra': 3},
+    'temp_store': {'default': 0, 'file': 1, 'memory': 2},
+}
+
+
+def get_profile(name=None):
+    name = name or config.DB_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Неизвестный профиль хранения '{name}', доступны: {', '.join(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+
+def connect(path, profile=None, **kwargs):
+    profile = get_profile(profile)
+    conn = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        cached_statements=profile['cached_statements'],
+        **kwargs
+    )
+    for pragma, value in profile['pragmas'].items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    return conn
+
+
+# Проверяет, что SQLite действительно применил профиль; возвращает список расхождений
+def check_profile(conn, profile=None):
+    mismatches = []
+    for pragma, value in get_profile(profile)['pragmas'].items():
+        row = conn.execute(f'PRAGMA {pragma}').fetchone()
+        actual = row[0] if row else None
+        expected = _PRAGMA_VALUES.get(pragma, {}).get(value, value)
+        if str(actual).lower() != str(expected).lower():
+            mismatches.append(f"{pragma}={actual} (ожидалось {value})")
+    return mismatches
+
+
+# Метка запроса для метрик: текст SQL без лишних пробелов
+@lru_cache(maxsize=1024)
+def statement_label(sql):
+    return ' '.join(sql.split())
+
+
+# Асинхронный доступ к SQLite, чтобы запросы не блокировали event loop.
+# Все записи идут через один поток-писатель: накопившиеся за время предыдущего коммита
+# операции выполняются в одной транзакции (каждая в своем SAVEPOINT) и коммитятся разом.
+# Чтения идут через небольшой пул потоков, у каждого потока свое соединение.
+class Database:
+    def __init__(self, path=None, readers=None, write_batch=None, profile=None):
+        self.path = path or config.DB_PATH
+        self.profile = profile
+        self.write_batch = write_batch or config.DB_WRITE_BATCH
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._reader = ThreadPoolExecutor(
+            max_workers=readers or config.DB_READERS,
+            thread_name_prefix='db-reader',
+            initializer=self._open_reader
+        )
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        # Транзакциями писателя управляем сами
+        self._write_conn = connect(self.path, self.profile, isolation_level=None)
+        self._write_queue = None
+        self._writer_task = None
+
+    def _open_reader(self):
+        conn = connect(self.path, self.profile)
+        conn.execute('PRAGMA query_only = ON')
+        self._local.conn = conn
+        with self._lock:
+            self._connections.append(conn)
+
+    def _read(self, fn, args):
+        return fn(self._local.conn, *args)
+
+    # Выполняет fn(conn, *args) в пуле читателей
+    async def read(self, fn, *args):
+        return await self._timed_read(fn.__name__, fn, args)
+
+    async def _timed_read(self, statement, fn, args):
+        loop = asyncio.get_running_loop()
+        started = perf_counter()
+        try:
+            return await loop.run_in_executor(self._reader, self._read, fn, args)
+        finally:
+            DB_QUERY_SECONDS.observe(perf_counter() - started, 'read', statement)
+
+    async def fetchall(self, sql, params=()):
+        return await self._timed_read(statement_label(sql), lambda conn: conn.execute(sql, params).fetchall(), ())
+
+    async def fetchone(self, sql, params=()):
+        return await self._timed_read(statement_label(sql), lambda conn: conn.execute(sql, params).fetchone(), ())
+
+    # Выполняет fn(conn, *args) в потоке-писателе; результат возвращается после коммита.
+    # fn не должна сама вызывать commit/rollback.
+    async def write(self, fn, *args):
+        return await self._timed_write(fn.__name__, fn, args)
+
+    async def _timed_write(self, statement, fn, args):
+        if self._writer_task is None:
+            self._write_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer_loop())
+        started = perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((fn, args, future))
+        try:
+            return await future
+        finally:
+            DB_QUERY_SECONDS.observe(perf_counter() - started, 'write', statement)
+
+    # Выполняет fn(conn, *args) в потоке-писателе вне транзакции (например, VACUUM).
+    # Пачки записей ждут, пока она не закончится
+    async def run_exclusive(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        started = perf_counter()
+        try:
+            return await loop.run_in_executor(self._writer, fn, self._write_conn, *args)
+        finally:
+            DB_QUERY_SECONDS.observe(perf_counter() - started, 'write', fn.__name__)
+
+    # Одиночный запрос на запись, возвращает количество измененных строк
+    async def execute(self, sql, params=()):
+        return await self._timed_write(statement_label(sql), lambda conn: conn.execute(sql, params).rowcount, ())
+
+    async def executemany(self, sql, seq_of_params):
+        return await self._timed_write(
+            statement_label(sql), lambda conn: conn.executemany(sql, seq_of_params).rowcount, ()
+        )
+
+    def _apply_batch(self, batch):
+        conn = self._write_conn
+        results = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for fn, args in batch:
+                # Ошибка одной операции откатывает только ее
+                conn.execute('SAVEPOINT op')
+                try:
+                    results.append((True, fn(conn, *args)))
+                    conn.execute('RELEASE op')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO op')
+                    conn.execute('RELEASE op')
+                    results.append((False, e))
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return results
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._write_queue.get()]
+            while len(items) < self.write_batch and not self._write_queue.empty():
+                items.append(self._write_queue.get_nowait())
+
+            try:
+                results = await loop.run_in_executor(
+                    self._writer, self._apply_batch, [(fn, args) for fn, args, _ in items]
+                )
+            except Exception as e:
+                logger.error(f"Не удалось записать пачку из {len(items)} операций: {e}")
+                results = [(False, e)] * len(items)
+
+            for (_, _, future), (ok, result) in zip(items, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+
+    # Дожидается записи всего, что уже в очереди, и закрывает соединения
+    async def close(self):
+        if self._writer_task is not None:
+            # Очередь обрабатывается по порядку, поэтому эта запись будет последней
+            await self._timed_write('close', lambda conn: None, ())
+            self._writer_task.cancel()
+            self._writer_task = None
+        self._reader.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        for conn in self._connections:
+            conn.close()
+        self._write_conn.close()
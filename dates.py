@@ -0,0 +1,68 @@
+import re
+from calendar import monthrange
+from datetime import date, timedelta
+
+# Разбор даты, введенной пользователем, за один проход одним скомпилированным выражением.
+# Абсолютная дата: ДД.ММ.ГГ или ДД.ММ.ГГГГ, разделители - точка, /, - или пробелы.
+# Относительная: +N и единица - д/d (дни), н/w (недели), м/m (месяцы), г/л/y (годы), например +1г или +6m.
+
+_DATE_RE = re.compile(
+    r'\s*(?:'
+    r'(?P<day>\d{1,2})(?:\s*[./-]\s*|\s+)(?P<month>\d{1,2})(?:\s*[./-]\s*|\s+)(?P<year>\d{4}|\d{2})'
+    r'|\+\s*(?P<amount>\d{1,3})\s*(?P<unit>[дdнwмmглy])[а-яa-z]*'
+    r')\s*',
+    re.IGNORECASE
+)
+
+_UNITS = {
+    'д': 'days', 'd': 'days',
+    'н': 'weeks', 'w': 'weeks',
+    'м': 'months', 'm': 'months',
+    'г': 'years', 'л': 'years', 'y': 'years',
+}
+
+
+# Текст не похож на дату
+class DateFormatError(ValueError):
+    pass
+
+
+# Формат правильный, но такой даты нет (например, 31.02)
+class InvalidDateError(ValueError):
+    pass
+
+
+def add_months(value, months):
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    # 31.01 + 1 месяц = последний день февраля
+    return value.replace(year=year, month=month, day=min(value.day, monthrange(year, month)[1]))
+
+
+def parse_date(text, today=None):
+    match = _DATE_RE.fullmatch(text)
+    if match is None:
+        raise DateFormatError(text)
+
+    day, month, year, amount, unit = match.groups()
+
+    if amount is not None:
+        today = today or date.today()
+        amount = int(amount)
+        unit = _UNITS[unit.lower()]
+        try:
+            if unit == 'days':
+                return today + timedelta(days=amount)
+            if unit == 'weeks':
+                return today + timedelta(weeks=amount)
+            return add_months(today, amount * 12 if unit == 'years' else amount)
+        except (ValueError, OverflowError) as e:
+            raise InvalidDateError(text) from e
+
+    # Короткий год - 21 век
+    year = int(year) + 2000 if len(year) == 2 else int(year)
+    try:
+        return date(year, int(month), int(day))
+    except ValueError as e:
+        raise InvalidDateError(text) from e
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections import deque
+from time import monotonic
+
+import config
+from outgoing import TokenBucket, classify_error
+
+logger = logging.getLogger(__name__)
+
+
+# Итоги одного запуска рассылки
+class DispatchStats:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self.latencies = []
+        self.errors = {}  # вид ошибки (outgoing.classify_error) -> количество
+        self.blocked = set()  # чаты, заблокировавшие бота (Forbidden)
+
+    @property
+    def throughput(self):
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    # Перцентиль задержки в секундах (p от 0 до 100): от начала запуска до отправки,
+    # вместе с ожиданием лимитов
+    def latency(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def add_error(self, error, count=1):
+        self.errors[error] = self.errors.get(error, 0) + count
+
+    def summary(self):
+        text = (
+            f"отправлено {self.sent}, ошибок {self.failed} за {self.elapsed:.1f} с "
+            f"({self.throughput:.1f} сообщ./с), задержка p50={self.latency(50) * 1000:.0f} мс "
+            f"p95={self.latency(95) * 1000:.0f} мс p99={self.latency(99) * 1000:.0f} мс"
+        )
+        if self.errors:
+            text += " (" + ", ".join(f"{error}: {count}" for error, count in sorted(self.errors.items())) + ")"
+        return text
+
+
+# Параллельная рассылка сообщений пулом воркеров с общим лимитом и лимитом на чат.
+# Сообщения раскладываются по очередям чатов, а воркерам выдаются только чаты, в которые
+# уже можно писать: чат с лимитом возвращается в очередь готовых по таймеру, и воркер
+# на нем не спит. Поэтому пользователь с множеством напоминаний не задерживает остальных.
+class ReminderDispatcher:
+    def __init__(self, bot, workers=None, rate=None, burst=None, chat_rate=None):
+        self.bot = bot
+        self.workers = workers or config.REMINDER_WORKERS
+        rate = config.REMINDER_RATE if rate is None else rate
+        burst = config.REMINDER_BURST if burst is None else burst
+        self.chat_rate = config.REMINDER_CHAT_RATE if chat_rate is None else chat_rate
+        self.global_bucket = TokenBucket(rate, max(burst, 1)) if rate > 0 else None
+
+    async def _send(self, chat_id, text, payload, stats, on_result):
+        if self.global_bucket:
+            await self.global_bucket.acquire()
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
+            stats.sent += 1
+            kind = None
+        except Exception as e:
+            # Повторы уже сделал слой исходящих запросов (outgoing), здесь ошибка окончательная.
+            # Ошибки по отдельным сообщениям только считаем по видам, итог пишется в лог один раз за рассылку
+            kind = classify_error(e)
+            stats.failed += 1
+            stats.add_error(kind)
+            if kind == 'forbidden':
+                stats.blocked.add(chat_id)
+            logger.debug(f"Не удалось отправить уведомление пользователю {chat_id}: {e}")
+        if on_result:
+            on_result(payload, kind)
+
+    # Отправляет все сообщения (chat_id, text, payload) и возвращает статистику запуска.
+    # on_result(payload, error) вызывается после каждой отправки: error - вид ошибки
+    # (outgoing.classify_error) или None, если сообщение доставлено.
+    # Задержка в статистике - от начала запуска до отправки, то есть с ожиданием лимитов.
+    async def run(self, messages, on_result=None):
+        stats = DispatchStats()
+        started = monotonic()
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.chat_rate if self.chat_rate > 0 else 0
+
+        # Пачка уже в памяти (claim_batch), поэтому раскладываем ее по чатам целиком
+        chats = {}
+        for chat_id, text, payload in messages:
+            chats.setdefault(chat_id, deque()).append((text, payload))
+        remaining = sum(len(queue) for queue in chats.values())
+
+        ready = asyncio.Queue()
+        for chat_id in chats:
+            ready.put_nowait(chat_id)
+        timers = []
+
+        def finish():
+            for _ in range(self.workers):
+                ready.put_nowait(None)
+
+        async def worker():
+            nonlocal remaining
+            while True:
+                chat_id = await ready.get()
+                if chat_id is None:
+                    return
+                queue = chats[chat_id]
+                text, payload = queue.popleft()
+                sent_at = monotonic()
+                await self._send(chat_id, text, payload, stats, on_result)
+                stats.latencies.append(monotonic() - started)
+
+                # Следующее сообщение в этот чат - не раньше чем через interval от начала этой отправки
+                if queue:
+                    delay = sent_at + interval - monotonic()
+                    if delay > 0:
+                        timers.append(loop.call_later(delay, ready.put_nowait, chat_id))
+                    else:
+                        ready.put_nowait(chat_id)
+                remaining -= 1
+                if remaining == 0:
+                    finish()
+
+        if not remaining:
+            finish()
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for timer in timers:
+                timer.cancel()
+            for task in workers:
+                task.cancel()
+
+        stats.elapsed = monotonic() - started
+        return stats
@@ -0,0 +1,79 @@
+import csv
+import json
+from datetime import date
+
+import config
+from rendering import format_day
+
+# Выгрузка товаров пользователя в CSV или JSON. Строки читаются из курсора пачками
+# по EXPORT_BATCH и сразу пишутся в файл, без списка всех товаров в памяти.
+# Отправка файла (InputFile в PTB) читает его в память целиком, поэтому размер файла
+# ограничен EXPORT_MAX_FILE_SIZE: товары сверх лимита в выгрузку не попадают.
+# CSV совпадает с форматом импорта (см. importer.py), так что выгрузку можно загрузить обратно.
+
+EXPORT_FORMATS = ('csv', 'json')
+
+CSV_HEADER = ('Название', 'Гарантия до', 'Категория', 'Магазин', 'Добавлен')
+
+# Размер файла проверяется раз в столько строк (tell() сбрасывает буфер записи)
+_SIZE_CHECK_ROWS = 100
+
+
+def _rows(conn, user_id):
+    cursor = conn.execute(
+        'SELECT product_name, warranty_date, category, store, created_at FROM products '
+        'WHERE user_id = ? ORDER BY warranty_date, id',
+        (user_id,)
+    )
+    while True:
+        rows = cursor.fetchmany(config.EXPORT_BATCH)
+        if not rows:
+            return
+        yield from rows
+
+
+# Строки, пока файл не дорос до max_size (с точностью до _SIZE_CHECK_ROWS строк)
+def _limited(f, rows, max_size):
+    for count, row in enumerate(rows):
+        if count and count % _SIZE_CHECK_ROWS == 0 and f.tell() >= max_size:
+            return
+        yield row
+
+
+def _write_csv(f, rows, max_size):
+    writer = csv.writer(f, delimiter=';')
+    writer.writerow(CSV_HEADER)
+    count = 0
+    for name, warranty_day, category, store, created_at in _limited(f, rows, max_size):
+        writer.writerow((name, format_day(warranty_day), category or '', store or '', created_at or ''))
+        count += 1
+    return count
+
+
+def _write_json(f, rows, max_size):
+    count = 0
+    f.write('[')
+    for name, warranty_day, category, store, created_at in _limited(f, rows, max_size):
+        f.write(',\n' if count else '\n')
+        json.dump({
+            'name': name,
+            'warranty_date': date.fromordinal(warranty_day).isoformat(),
+            'category': category,
+            'store': store,
+            'created_at': created_at,
+        }, f, ensure_ascii=False)
+        count += 1
+    f.write('\n]\n' if count else ']\n')
+    return count
+
+
+# Пишет товары пользователя в файл path, возвращает (выгружено, всего товаров).
+# Выполняется в пуле читателей Database.read
+def export_products(conn, path, user_id, fmt, max_size=None):
+    max_size = max_size or config.EXPORT_MAX_FILE_SIZE
+    write = _write_json if fmt == 'json' else _write_csv
+    # utf-8-sig, чтобы Excel открыл CSV с кириллицей
+    with open(path, 'w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='') as f:
+        count = write(f, _rows(conn, user_id), max_size)
+    total = conn.execute('SELECT COUNT(*) FROM products WHERE user_id = ?', (user_id,)).fetchone()[0]
+    return count, max(total, count)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Минимальный HTTP/1.1 сервер на asyncio без внешних зависимостей.
+# Нужен только для локальных служебных эндпоинтов (вебхук, метрики), поэтому
+# поддерживает лишь Content-Length (без chunked) и keep-alive.
+
+MAX_HEADER_SIZE = 16 * 1024
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(STATUS_TEXT.get(status, str(status)))
+        self.status = status
+
+
+# handler(method, path, headers, body) -> (status, content_type, body)
+# Заголовки передаются словарем с ключами в нижнем регистре.
+class HttpServer:
+    def __init__(self, handler, host, port, max_body=1024 * 1024):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._server = None
+        self._connections = set()
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.draining = False
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # При port=0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP сервер слушает {self.host}:{self.port}")
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(413)
+        if len(head) > MAX_HEADER_SIZE:
+            raise HttpError(413)
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, path, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HttpError(400)
+
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HttpError(400)
+        if length < 0:
+            raise HttpError(400)
+        if length > self.max_body:
+            raise HttpError(413)
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    async def _serve(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while not self.draining:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                except HttpError as e:
+                    await self._respond(writer, e.status, 'text/plain', e.args[0].encode(), False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                self._in_flight += 1
+                self._idle.clear()
+                try:
+                    status, content_type, payload = await self.handler(method, path, headers, body)
+                except HttpError as e:
+                    status, content_type, payload = e.status, 'text/plain', e.args[0].encode()
+                except Exception as e:
+                    logger.error(f"Ошибка обработки HTTP запроса {method} {path}: {e}")
+                    status, content_type, payload = 500, 'text/plain', b'Internal Server Error'
+                finally:
+                    self._in_flight -= 1
+                    if not self._in_flight:
+                        self._idle.set()
+
+                await self._respond(writer, status, content_type, payload, keep_alive and not self.draining)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _respond(self, writer, status, content_type, payload, keep_alive):
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    # Перестает принимать соединения и ждет завершения запросов, которые уже обрабатываются
+    async def drain(self, timeout):
+        self.draining = True
+        if self._server is not None:
+            self._server.close()
+        # wait_for с нулевым таймаутом истекает даже на уже установленном событии, поэтому
+        # ждем только если запросы есть и время задано
+        if not self._idle.is_set() and timeout > 0:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if not self._idle.is_set():
+            logger.warning(f"Не дождались завершения {self._in_flight} HTTP запросов")
+        for writer in list(self._connections):
+            writer.close()
+        if self._server is not None:
+            await self._server.wait_closed()
@@ -0,0 +1,158 @@
+import codecs
+import csv
+
+import config
+from dates import DateFormatError, InvalidDateError, parse_date
+from reminders import next_reminder_day
+
+# Импорт товаров из CSV/TSV: название; дата окончания гарантии; [категория; [магазин]].
+# Файл читается построчно и вставляется пачками в одной транзакции писателя,
+# поэтому память не зависит от размера файла, а при ошибке записи не остается половины импорта.
+
+# Названия, которые нельзя использовать (как в диалоге добавления)
+RESERVED_NAMES = {"📦 Добавить товар", "📋 Мои товары", "↩️ Отмена"}
+
+ERROR_TEXTS = {
+    'columns': "нужно минимум два поля: название и дата",
+    'name': "пустое или недопустимое название",
+    'format': "неверный формат даты",
+    'invalid': "такой даты нет",
+    'past': "дата уже прошла",
+    'csv': "незакрытая кавычка или слишком длинное поле, дальше файл не прочитан",
+}
+
+
+# Итоги импорта: сколько добавлено и ошибки по строкам (первые IMPORT_MAX_ERRORS)
+class ImportResult:
+    def __init__(self):
+        self.added = 0
+        self.error_count = 0
+        self.errors = []  # (номер строки, код ошибки)
+
+    def add_error(self, line, code):
+        self.error_count += 1
+        if len(self.errors) < config.IMPORT_MAX_ERRORS:
+            self.errors.append((line, code))
+
+
+# Кодировка по началу файла: UTF-8 (в том числе с BOM), иначе cp1251 из русского Excel
+def detect_encoding(path, sample_size=64 * 1024):
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'cp1251'
+    return 'utf-8-sig'
+
+
+# Разделитель по первой непустой строке: табуляция, точка с запятой или запятая
+def detect_delimiter(line):
+    counts = {delimiter: line.count(delimiter) for delimiter in '\t;,'}
+    delimiter = max(counts, key=counts.get)
+    return delimiter if counts[delimiter] else ','
+
+
+# Строки файла по одной: (номер строки, поля). Пустые строки пропускаются.
+# Если файл дальше не разобрать (csv.Error), последней идет (номер строки, None)
+def read_rows(path):
+    with open(path, encoding=detect_encoding(path), errors='replace', newline='') as f:
+        first = ''
+        for first in f:
+            if first.strip():
+                break
+        f.seek(0)
+        reader = csv.reader(f, delimiter=detect_delimiter(first))
+        while True:
+            line = reader.line_num + 1
+            try:
+                fields = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                # Незакрытая кавычка забирает остаток файла в одно поле, читать дальше нечего
+                yield line, None
+                return
+            if any(field.strip() for field in fields):
+                yield reader.line_num, [field.strip() for field in fields]
+
+
+# Проверенные строки: (номер строки, значения для INSERT или None, код ошибки).
+# Первая строка с неразборчивой датой считается заголовком.
+def parse_rows(rows, user_id, today):
+    today_day = today.toordinal()
+    first = True
+    for line, fields in rows:
+        is_first, first = first, False
+        if fields is None:
+            yield line, None, 'csv'
+            continue
+        if len(fields) < 2:
+            yield line, None, 'columns'
+            continue
+
+        name, date_text = fields[0], fields[1]
+        try:
+            warranty_date = parse_date(date_text, today)
+        except DateFormatError:
+            if not is_first:
+                yield line, None, 'format'
+            continue
+        except InvalidDateError:
+            yield line, None, 'invalid'
+            continue
+
+        if not name or name in RESERVED_NAMES:
+            yield line, None, 'name'
+            continue
+        if warranty_date <= today:
+            yield line, None, 'past'
+            continue
+
+        warranty_day = warranty_date.toordinal()
+        yield line, (
+            user_id, name, warranty_day, next_reminder_day(warranty_day, today_day),
+            fields[2] if len(fields) > 2 and fields[2] else None,
+            fields[3] if len(fields) > 3 and fields[3] else None,
+        ), None
+
+
+# Импорт файла path в товары пользователя. Выполняется в потоке-писателе Database.write,
+# вставки идут пачками по IMPORT_BATCH строк
+def import_products(conn, path, user_id, today):
+    result = ImportResult()
+    batch = []
+
+    def flush():
+        conn.executemany(
+            'INSERT INTO products (user_id, product_name, warranty_date, next_reminder, category, store) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            batch
+        )
+        result.added += len(batch)
+        batch.clear()
+
+    for line, values, error in parse_rows(read_rows(path), user_id, today):
+        if error:
+            result.add_error(line, error)
+            continue
+        batch.append(values)
+        if len(batch) >= config.IMPORT_BATCH:
+            flush()
+    if batch:
+        flush()
+    return result
+
+
+def render_import_result(result):
+    if result.added:
+        text = f"✅ *Импортировано товаров:* {result.added}\n"
+    else:
+        text = "❌ *Не удалось импортировать ни одного товара.*\n"
+    if result.error_count:
+        text += f"\n*Пропущено строк:* {result.error_count}\n"
+        text += "".join(f"Строка {line}: {ERROR_TEXTS[code]}\n" for line, code in result.errors)
+        hidden = result.error_count - len(result.errors)
+        if hidden:
+            text += f"...и еще {hidden}\n"
+    return text
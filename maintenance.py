@@ -0,0 +1,95 @@
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Обслуживание базы: перенос давно просроченных товаров в архив, возврат свободных
+# страниц файлу (incremental_vacuum) и обновление статистики планировщика (PRAGMA optimize).
+# Запускается раз в сутки в тихий час, архив переносится небольшими пачками,
+# чтобы обработчики не ждали писателя.
+
+_ARCHIVE_COLUMNS = 'id, user_id, product_name, warranty_date, category, store, created_at'
+
+
+# Новая пустая база сразу создается с incremental auto_vacuum (VACUUM пустой базы мгновенный).
+# Вызывается при старте до создания схемы
+def init_incremental_vacuum(conn):
+    if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0]:
+        return
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+
+# Включает incremental auto_vacuum на существующей базе. Режим меняется только после
+# полного VACUUM: он переписывает весь файл и требует столько же места на диске, поэтому
+# выполняется один раз в ночном обслуживании (Database.run_exclusive), а не при старте.
+# Возвращает True, если режим был переключен
+def ensure_incremental_vacuum(conn):
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    logger.info("Включаем incremental auto_vacuum (однократный полный VACUUM)...")
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+# Переносит в архив до limit товаров, гарантия которых кончилась раньше cutoff_day.
+# Просроченные товары находятся по индексу next_reminder: у них он пустой или не позже даты гарантии.
+# Возвращает user_id владельцев перенесенных товаров (с повторами).
+def archive_batch(conn, cutoff_day, limit):
+    rows = conn.execute(
+        'SELECT id, user_id FROM products '
+        'WHERE (next_reminder IS NULL OR next_reminder < ?) AND warranty_date < ? LIMIT ?',
+        (cutoff_day, cutoff_day, limit)
+    ).fetchall()
+    if not rows:
+        return []
+
+    placeholders = ','.join('?' * len(rows))
+    ids = [product_id for product_id, _ in rows]
+    conn.execute(
+        f'INSERT OR REPLACE INTO products_archive ({_ARCHIVE_COLUMNS}) '
+        f'SELECT {_ARCHIVE_COLUMNS} FROM products WHERE id IN ({placeholders})',
+        ids
+    )
+    conn.execute(f'DELETE FROM products WHERE id IN ({placeholders})', ids)
+    return [user_id for _, user_id in rows]
+
+
+# Возвращает файлу до pages свободных страниц (0 - все) и обновляет статистику.
+# Возвращает количество страниц, оставшихся свободными
+def vacuum_and_optimize(conn, pages):
+    # incremental_vacuum освобождает по странице за шаг, поэтому результат читаем до конца
+    conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+    conn.execute('PRAGMA optimize')
+    return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+# Архивные товары пользователя: последние limit по дате гарантии и общее количество
+def get_archive(conn, user_id, limit):
+    total = conn.execute('SELECT COUNT(*) FROM products_archive WHERE user_id = ?', (user_id,)).fetchone()[0]
+    products = conn.execute(
+        'SELECT product_name, warranty_date FROM products_archive '
+        'WHERE user_id = ? ORDER BY warranty_date DESC, id DESC LIMIT ?',
+        (user_id, limit)
+    ).fetchall()
+    return products, total
+
+
+# Полное обслуживание: архив пачками, затем vacuum и optimize.
+# Возвращает (перенесено товаров, множество затронутых пользователей, свободных страниц)
+async def run_maintenance(db, today_day):
+    cutoff_day = today_day - config.ARCHIVE_AFTER_DAYS
+    archived = 0
+    users = set()
+    while True:
+        batch = await db.write(archive_batch, cutoff_day, config.ARCHIVE_BATCH)
+        archived += len(batch)
+        users.update(batch)
+        if len(batch) < config.ARCHIVE_BATCH:
+            break
+    # После архива, чтобы переписывать файл уже без перенесенных товаров
+    await db.run_exclusive(ensure_incremental_vacuum)
+    free_pages = await db.write(vacuum_and_optimize, config.VACUUM_PAGES)
+    return archived, users, free_pages
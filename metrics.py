@@ -0,0 +1,183 @@
+import functools
+import logging
+from bisect import bisect_left
+from time import perf_counter
+
+from telegram.request import HTTPXRequest
+
+from httpserver import HttpError, HttpServer
+
+logger = logging.getLogger(__name__)
+
+# Метрики в памяти процесса и их выдача в текстовом формате Prometheus.
+# Все обновления идут из event loop, поэтому блокировки не нужны. Запись - это поиск
+# корзины и пара сложений, так что сбор метрик можно не выключать.
+
+# Границы корзин гистограмм по умолчанию, секунд
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_METRICS = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+# Счетчик; значения меток передаются позиционно в порядке labels
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        _METRICS.append(self)
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+
+# Текущее значение (например, действующий лимит отправки)
+class Gauge:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        _METRICS.append(self)
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+
+# Гистограмма с фиксированными корзинами; корзины хранятся не накопительно
+# и суммируются только при выдаче
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # метки -> [счетчики корзин..., +Inf, сумма]
+        _METRICS.append(self)
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in sorted(self.series.items()):
+            total = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                total += count
+                bucket = _labels(self.labels, labels, f'le="{bound}"')
+                yield f'{self.name}_bucket{bucket} {total}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {series[-1]}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {total}'
+
+
+HANDLER_SECONDS = Histogram('bot_handler_seconds', 'Время обработки обновления', ('handler',))
+HANDLER_ERRORS = Counter('bot_handler_errors_total', 'Исключения в обработчиках', ('handler', 'error'))
+DB_QUERY_SECONDS = Histogram(
+    'bot_db_query_seconds', 'Время запроса к базе с ожиданием очереди', ('operation', 'statement')
+)
+TELEGRAM_REQUEST_SECONDS = Histogram('bot_telegram_request_seconds', 'Время запроса к Bot API', ('method',))
+TELEGRAM_ERRORS = Counter('bot_telegram_errors_total', 'Ошибки запросов к Bot API', ('method', 'error'))
+REMINDER_RUNS = Counter('bot_reminder_runs_total', 'Запуски рассылки напоминаний')
+REMINDER_RUN_SECONDS = Histogram(
+    'bot_reminder_run_seconds', 'Длительность рассылки напоминаний', buckets=(1, 10, 60, 300, 900, 1800, 3600)
+)
+REMINDER_MESSAGES = Counter('bot_reminder_messages_total', 'Напоминания по итогу рассылки', ('result',))
+REMINDER_SEND_ERRORS = Counter('bot_reminder_send_errors_total', 'Ошибки отправки напоминаний', ('error',))
+USERS_BLOCKED = Counter('bot_users_blocked_total', 'Пользователи, помеченные неактивными после Forbidden')
+OUTGOING_RATE = Gauge('bot_outgoing_rate', 'Действующий лимит исходящих запросов, в секунду')
+OUTGOING_PAUSED_SECONDS = Counter(
+    'bot_outgoing_paused_seconds_total', 'Время полной остановки отправки по RetryAfter, с'
+)
+OUTGOING_RETRY_AFTER = Counter('bot_outgoing_retry_after_total', 'Ответы RetryAfter (429)', ('method',))
+OUTGOING_RETRIES = Counter('bot_outgoing_retries_total', 'Повторы запросов к Bot API', ('method', 'kind'))
+OUTGOING_ERRORS = Counter(
+    'bot_outgoing_errors_total', 'Ошибки запросов к Bot API после всех повторов', ('method', 'kind')
+)
+
+
+# Все метрики в текстовом формате Prometheus
+def render():
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+# Замеряет время и исключения обработчика Telegram
+def timed_handler(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(perf_counter() - started, name)
+
+    return wrapper
+
+
+# Запросы к Bot API с замером времени и классов ошибок по методу (sendMessage, editMessageText...)
+class InstrumentedRequest(HTTPXRequest):
+    async def post(self, url, *args, **kwargs):
+        method = url.rsplit('/', 1)[-1]
+        started = perf_counter()
+        try:
+            return await super().post(url, *args, **kwargs)
+        except Exception as e:
+            TELEGRAM_ERRORS.inc(method, type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_REQUEST_SECONDS.observe(perf_counter() - started, method)
+
+
+def make_handler(url_path):
+    async def handle(method, path, headers, body):
+        if path != url_path:
+            raise HttpError(404)
+        if method != 'GET':
+            raise HttpError(405)
+        return 200, 'text/plain; version=0.0.4; charset=utf-8', render().encode()
+
+    return handle
+
+
+# Запускает эндпоинт метрик; останавливается через drain() сервера
+async def start_server(host, port, url_path='/metrics'):
+    server = HttpServer(make_handler(url_path), host, port, max_body=0)
+    await server.start()
+    logger.info(f"Метрики доступны по адресу http://{host}:{server.port}{url_path}")
+    return server
@@ -0,0 +1,200 @@
+import logging
+from datetime import datetime, timedelta
+
+from reminders import REMINDER_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Версионные миграции схемы. Номер последней примененной миграции хранится в PRAGMA user_version.
+# Уже выпущенные миграции не меняем - только добавляем новые в конец списка.
+
+
+# 1. Исходная таблица товаров
+def create_products(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            product_name TEXT NOT NULL,
+            warranty_date TEXT NOT NULL,
+            category TEXT,
+            store TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+# 2. Дата следующего напоминания (у баз без номера версии колонка уже может быть)
+def add_next_reminder(cursor):
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(products)')]
+    if 'next_reminder' not in columns:
+        cursor.execute('ALTER TABLE products ADD COLUMN next_reminder TEXT')
+        today = datetime.now().date()
+        cursor.execute(
+            'SELECT id, warranty_date FROM products WHERE warranty_date >= ?',
+            (today.strftime('%Y-%m-%d'),)
+        )
+        updates = []
+        for product_id, warranty_date_str in cursor.fetchall():
+            warranty_date = datetime.strptime(warranty_date_str, '%Y-%m-%d').date()
+            reminder_dates = [warranty_date - timedelta(days=days) for days in REMINDER_DAYS]
+            next_date = min(d for d in reminder_dates if d >= today)
+            updates.append((next_date.strftime('%Y-%m-%d'), product_id))
+        cursor.executemany('UPDATE products SET next_reminder = ? WHERE id = ?', updates)
+
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_products_next_reminder ON products (next_reminder)'
+    )
+
+
+# 3. Журнал отправки напоминаний (см. outbox.py)
+def create_reminder_outbox(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reminder_outbox (
+            product_id INTEGER NOT NULL,
+            threshold INTEGER NOT NULL,
+            run_date TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (product_id, threshold, run_date)
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_outbox_claim ON reminder_outbox (run_date, status, user_id)'
+    )
+
+
+# 4. Даты товаров храним номером дня (date.toordinal()) вместо текста и добавляем
+# составной индекс для списка товаров. Тип колонки в SQLite поменять нельзя,
+# поэтому таблица пересобирается с сохранением id и счетчика AUTOINCREMENT.
+def integer_dates(cursor):
+    # julianday('0001-01-01') = 1721425.5, а его порядковый номер - 1
+    to_day = "CAST(julianday({}) - 1721424.5 AS INTEGER)"
+
+    cursor.execute('''
+        CREATE TABLE products_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            product_name TEXT NOT NULL,
+            warranty_date INTEGER NOT NULL,
+            category TEXT,
+            store TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            next_reminder INTEGER
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO products_new
+            (id, user_id, product_name, warranty_date, category, store, created_at, next_reminder)
+        SELECT id, user_id, product_name, {to_day.format('warranty_date')}, category, store, created_at,
+               {to_day.format('next_reminder')}
+        FROM products
+    ''')
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'products'")
+    sequence = cursor.fetchone()
+
+    cursor.execute('DROP TABLE products')
+    cursor.execute('ALTER TABLE products_new RENAME TO products')
+    if sequence:
+        cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'products'", sequence)
+
+    # Список товаров пользователя - диапазон по индексу, уже отсортированный по дате
+    cursor.execute('CREATE INDEX idx_products_user_date ON products (user_id, warranty_date)')
+    cursor.execute('CREATE INDEX idx_products_next_reminder ON products (next_reminder)')
+
+
+# 5. Состояние диалогов и user_data между перезапусками (см. persistence.py)
+def create_persistence(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persistence_user_data (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persistence_conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        )
+    ''')
+
+
+# 6. Часовой пояс и час рассылки пользователя (см. timezones.py).
+# Индекс нужен, чтобы часовая рассылка выбирала только своих пользователей
+def create_user_settings(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_settings (
+            user_id INTEGER PRIMARY KEY,
+            timezone TEXT NOT NULL,
+            reminder_hour INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_user_settings_bucket ON user_settings (timezone, reminder_hour)'
+    )
+
+
+# 7. Архив давно просроченных товаров (см. maintenance.py)
+def create_products_archive(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            product_name TEXT NOT NULL,
+            warranty_date INTEGER NOT NULL,
+            category TEXT,
+            store TEXT,
+            created_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_products_archive_user_date ON products_archive (user_id, warranty_date)'
+    )
+
+
+# 8. Статус доставки пользователям (см. users.py). Частичный индекс содержит только
+# неактивных, поэтому фильтр рассылки по нему стоит столько, сколько их самих
+def create_users(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            active INTEGER NOT NULL DEFAULT 1,
+            blocked_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_inactive ON users (user_id) WHERE active = 0')
+
+
+MIGRATIONS = [
+    create_products,
+    add_next_reminder,
+    create_reminder_outbox,
+    integer_dates,
+    create_persistence,
+    create_user_settings,
+    create_products_archive,
+    create_users,
+]
+
+
+# Применяет недостающие миграции, каждую в своей транзакции
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Миграция базы {number}: {migration.__name__}")
+        conn.execute('BEGIN')
+        try:
+            migration(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(MIGRATIONS)
@@ -0,0 +1,194 @@
+import json
+from datetime import timedelta
+
+from reminders import REMINDER_DAYS, next_reminder_day
+from users import active_condition
+
+# Журнал напоминаний (таблица reminder_outbox): одна строка на (товар, порог, день рассылки).
+# pending - поставлено в очередь, sending - забрано на отправку, sent - доставлено,
+# failed - временная ошибка (сеть, RetryAfter), повторяется до REMINDER_MAX_ATTEMPTS раз,
+# unknown - таймаут: сообщение могло дойти, поэтому не повторяется,
+# rejected - постоянная ошибка (неверный запрос, бот заблокирован), не повторяется.
+# Строки в sending после падения процесса повторно не отправляются: лучше потерять
+# одно напоминание, чем прислать его дважды.
+
+# Сколько дней храним журнал
+OUTBOX_KEEP_DAYS = 7
+
+
+# Условие выборки пользователей одного шарда: shard = (номер, всего шардов) или None - все.
+# Остаток берется неотрицательным, так как id групповых чатов отрицательные.
+def shard_condition(column, shard):
+    if shard is None or shard[1] <= 1:
+        return '', ()
+    index, count = shard
+    return f' AND (({column} % ?) + ?) % ? = ?', (count, count, count, index)
+
+
+# Условие выборки пользователей часовой корзины (см. timezones.current_buckets) или None - все.
+# Пользователи с настройками берутся по индексу (timezone, reminder_hour).
+def bucket_condition(column, bucket):
+    if bucket is None:
+        return '', ()
+    pairs, include_default = bucket
+    conditions = []
+    params = []
+    if pairs:
+        matches = ' OR '.join('(timezone = ? AND reminder_hour = ?)' for _ in pairs)
+        conditions.append(f'{column} IN (SELECT user_id FROM user_settings WHERE {matches})')
+        params.extend(value for pair in pairs for value in pair)
+    if include_default:
+        conditions.append(f'{column} NOT IN (SELECT user_id FROM user_settings)')
+    if not conditions:
+        return ' AND 0', ()
+    return f" AND ({' OR '.join(conditions)})", tuple(params)
+
+
+# Оба условия сразу: шард и часовая корзина
+def users_condition(column, shard=None, bucket=None):
+    shard_sql, shard_params = shard_condition(column, shard)
+    bucket_sql, bucket_params = bucket_condition(column, bucket)
+    return shard_sql + bucket_sql, shard_params + bucket_params
+
+
+# Ставит в очередь напоминания на сегодня и переносит next_reminder у товаров.
+# Выполняется целиком в одной транзакции писателя, поэтому повторный запуск не создаст дублей.
+# product_ids ограничивает выборку товарами из колеса напоминаний (см. scheduler).
+# Товары неактивных пользователей (заблокировали бота) не берутся и не переносятся.
+def enqueue_due_reminders(conn, today, shard=None, bucket=None, product_ids=None):
+    cursor = conn.cursor()
+    today_str = today.strftime('%Y-%m-%d')
+    today_day = today.toordinal()
+    shard_sql, shard_params = users_condition('user_id', shard, bucket)
+    shard_sql += active_condition('user_id')
+    if product_ids is not None:
+        shard_sql += ' AND id IN (SELECT value FROM json_each(?))'
+        shard_params += (json.dumps(product_ids),)
+
+    # Берем по индексу только товары, у которых напоминание на сегодня
+    # (или пропущено, если бот в тот день не работал)
+    cursor.execute(
+        'SELECT id, user_id, product_name, warranty_date FROM products WHERE next_reminder <= ?' + shard_sql,
+        (today_day, *shard_params)
+    )
+
+    entries = []
+    seen = set()
+    next_reminders = []
+
+    for product_id, user_id, product_name, warranty_day in cursor.fetchall():
+        days_left = warranty_day - today_day
+
+        # Переносим напоминание на следующий порог (после отправки или пропуска)
+        next_reminders.append((next_reminder_day(warranty_day, today_day + 1), product_id))
+
+        # Одинаковые товары одного пользователя - одно напоминание
+        key = (user_id, product_name, warranty_day)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        # ✅ ПРАВИЛЬНО: уведомления ТОЛЬКО за 30, 14, 7, 1, 0 дней
+        if days_left in REMINDER_DAYS:
+            entries.append((product_id, days_left, today_str, user_id))
+
+    cursor.executemany(
+        'INSERT OR IGNORE INTO reminder_outbox (product_id, threshold, run_date, user_id) VALUES (?, ?, ?, ?)',
+        entries
+    )
+    cursor.executemany('UPDATE products SET next_reminder = ? WHERE id = ?', next_reminders)
+    cursor.execute(
+        'DELETE FROM reminder_outbox WHERE run_date < ?',
+        ((today - timedelta(days=OUTBOX_KEEP_DAYS)).strftime('%Y-%m-%d'),)
+    )
+    return len(entries)
+
+
+# Сколько сообщений на сегодня не отправлено, потому что пользователь заблокировал бота.
+# Считаются сообщения так, как их собрала бы рассылка: одно на одинаковые товары пользователя,
+# в режиме сводок (digest) - одно на пользователя.
+# Товары неактивных берутся по индексу через их немногих владельцев
+def count_skipped_inactive(conn, today, shard=None, bucket=None, digest=False):
+    shard_sql, shard_params = users_condition('user_id', shard, bucket)
+    days = [today.toordinal() + days_left for days_left in REMINDER_DAYS]
+    messages = 'DISTINCT user_id' if digest else 'DISTINCT user_id, product_name, warranty_date'
+    return conn.execute(
+        f'SELECT COUNT(*) FROM (SELECT {messages} FROM products '
+        'WHERE user_id IN (SELECT user_id FROM users WHERE active = 0) '
+        f"AND warranty_date IN ({','.join('?' * len(days))})" + shard_sql + ')',
+        (*days, *shard_params)
+    ).fetchone()[0]
+
+
+# Сколько напоминаний за день зависло в sending (процесс упал во время отправки)
+def count_interrupted(conn, today, shard=None, bucket=None):
+    cursor = conn.cursor()
+    shard_sql, shard_params = users_condition('user_id', shard, bucket)
+    cursor.execute(
+        "SELECT COUNT(*) FROM reminder_outbox WHERE run_date = ? AND status = 'sending'" + shard_sql,
+        (today.strftime('%Y-%m-%d'), *shard_params)
+    )
+    return cursor.fetchone()[0]
+
+
+# Забирает на отправку очередную пачку пользователей целиком:
+# новые напоминания и упавшие, у которых еще остались попытки.
+# Берутся строки за все дни журнала (OUTBOX_KEEP_DAYS) и всех часовых корзин, а не только
+# текущего запуска: next_reminder переносится уже при постановке в очередь, поэтому
+# строки, оставшиеся в pending после падения, дорассылает следующий запуск.
+# Заблокировавшим бота во время рассылки повторы не отправляются.
+# Возвращает [(user_id, days_left, product_name, key)].
+def claim_batch(conn, today, users_limit, max_attempts, shard=None):
+    cursor = conn.cursor()
+    since = (today - timedelta(days=OUTBOX_KEEP_DAYS)).strftime('%Y-%m-%d')
+    claimable = "(o.status = 'pending' OR (o.status = 'failed' AND o.attempts < ?))"
+    shard_sql, shard_params = shard_condition('o.user_id', shard)
+    shard_sql += active_condition('o.user_id')
+
+    cursor.execute(f'''
+        SELECT o.user_id, o.threshold, p.product_name, o.product_id, o.run_date
+        FROM reminder_outbox o JOIN products p ON p.id = o.product_id
+        WHERE o.run_date >= ? AND {claimable} AND o.user_id IN (
+            SELECT o.user_id
+            FROM reminder_outbox o JOIN products p ON p.id = o.product_id
+            WHERE o.run_date >= ? AND {claimable}{shard_sql}
+            GROUP BY o.user_id
+            ORDER BY MIN(o.attempts), o.user_id
+            LIMIT ?
+        )
+    ''', (since, max_attempts, since, max_attempts, *shard_params, users_limit))
+
+    batch = [
+        (user_id, threshold, product_name, (product_id, threshold, run_date))
+        for user_id, threshold, product_name, product_id, run_date in cursor.fetchall()
+    ]
+
+    cursor.executemany(
+        "UPDATE reminder_outbox SET status = 'sending', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP "
+        "WHERE product_id = ? AND threshold = ? AND run_date = ?",
+        [key for _, _, _, key in batch]
+    )
+    return batch
+
+
+# Статус строки журнала по результату отправки: error - вид ошибки
+# (outgoing.classify_error) или None, если сообщение доставлено
+def result_status(error):
+    if error is None:
+        return 'sent'
+    if error in ('network', 'flood'):
+        return 'failed'
+    if error == 'timeout':
+        return 'unknown'
+    return 'rejected'
+
+
+# Записывает результат отправки пачки: {статус: [ключи]}
+def mark_results(conn, results):
+    cursor = conn.cursor()
+    for status, keys in results.items():
+        cursor.executemany(
+            'UPDATE reminder_outbox SET status = ?, updated_at = CURRENT_TIMESTAMP '
+            'WHERE product_id = ? AND threshold = ? AND run_date = ?',
+            [(status, *key) for key in keys]
+        )
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+from datetime import timedelta
+from time import monotonic
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.ext import BaseRateLimiter
+
+import config
+from metrics import OUTGOING_ERRORS, OUTGOING_PAUSED_SECONDS, OUTGOING_RATE, OUTGOING_RETRIES, OUTGOING_RETRY_AFTER
+
+logger = logging.getLogger(__name__)
+
+# Слой исходящих запросов к Bot API. Через него идут все вызовы бота: ответы обработчиков
+# и рассылка напоминаний (ExtBot передает каждый запрос, кроме getUpdates, в process_request).
+# - Общий лимит запросов в секунду. После RetryAfter отправка останавливается для всех
+#   на указанное время, лимит уменьшается вдвое и восстанавливается понемногу с каждым
+#   успешным запросом.
+# - Сетевые ошибки повторяются с экспоненциальной паузой со случайным разбросом.
+#   Таймаут отправки сообщения не повторяется: сообщение могло дойти, а дубль хуже потери.
+# - Остальные ошибки (бот заблокирован, неверный запрос) постоянные и сразу пробрасываются.
+# - Пока шарды рассылки работают в отдельных процессах, лимит делится между ними и ботом,
+#   а пауза после RetryAfter общая для всех процессов (shared_pause).
+
+
+# Токен-бакет: не больше rate событий в секунду, с запасом на burst событий разом.
+# Токены резервируются сразу, поэтому параллельные задачи встают в очередь честно.
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = monotonic()
+
+    # Забираем токен и возвращаем, сколько секунд нужно подождать
+    def reserve(self):
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# Вид ошибки запроса: flood, timeout, network - временные, остальные постоянные
+def classify_error(error):
+    if isinstance(error, RetryAfter):
+        return 'flood'
+    if isinstance(error, Forbidden):
+        return 'forbidden'  # бот заблокирован или пользователь удален
+    if isinstance(error, ChatMigrated):
+        return 'migrated'
+    # BadRequest и TimedOut - подклассы NetworkError, проверяем их раньше
+    if isinstance(error, BadRequest):
+        return 'bad_request'
+    if isinstance(error, TimedOut):
+        return 'timeout'
+    if isinstance(error, NetworkError):
+        return 'network'
+    return 'other'
+
+
+# Повторный запрос безопасен: RetryAfter и ошибки соединения означают, что запрос не выполнен.
+# После таймаута повторяем только запросы, которые не отправляют и не меняют сообщения
+def is_retryable(kind, endpoint):
+    if kind == 'timeout':
+        return not endpoint.startswith(('send', 'copy', 'forward', 'edit', 'delete'))
+    return kind in ('flood', 'network')
+
+
+# PTB 22 хранит паузу как timedelta, а публичный retry_after при каждом обращении
+# предупреждает о смене типа, поэтому сначала берем внутреннее значение
+def retry_after_seconds(error):
+    value = getattr(error, '_retry_after', None)
+    if value is None:
+        value = error.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+# Пауза перед повтором номер attempt (с нуля): экспонента со случайным разбросом
+def backoff_delay(attempt):
+    return random.uniform(0, min(config.OUTGOING_MAX_BACKOFF, config.OUTGOING_BACKOFF * 2 ** attempt))
+
+
+class OutgoingLimiter(BaseRateLimiter):
+    def __init__(self, rate=None, min_rate=None, max_retries=None, shared_pause=None):
+        self.max_rate = config.OUTGOING_RATE if rate is None else rate
+        self.base_min_rate = config.OUTGOING_MIN_RATE if min_rate is None else min_rate
+        self.min_rate = min(self.base_min_rate, self.max_rate)
+        self.max_retries = config.OUTGOING_MAX_RETRIES if max_retries is None else max_retries
+        self.bucket = TokenBucket(self.max_rate, max(int(self.max_rate), 1)) if self.max_rate > 0 else None
+        self.resume_at = 0.0  # до этого момента (monotonic) все запросы ждут после RetryAfter
+        # То же для нескольких процессов: multiprocessing.Value('d') или None.
+        # Часы monotonic на Linux общие для всех процессов машины
+        self.shared_pause = shared_pause
+        OUTGOING_RATE.set(self.max_rate)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    # Меняет лимит на ходу с сохранением текущего снижения после RetryAfter
+    # (бот отдает часть лимита шардам рассылки, пока они работают)
+    def set_max_rate(self, rate):
+        if not self.bucket or rate <= 0:
+            return
+        share = self.bucket.rate / self.max_rate
+        self.max_rate = rate
+        self.min_rate = min(self.base_min_rate, rate)
+        self.bucket.rate = max(self.min_rate, rate * share)
+        self.bucket.burst = max(int(rate), 1) if share >= 1 else 1
+        self.bucket.tokens = min(self.bucket.tokens, self.bucket.burst)
+        OUTGOING_RATE.set(round(self.bucket.rate, 2))
+
+    def _resume_at(self):
+        if self.shared_pause is None:
+            return self.resume_at
+        return max(self.resume_at, self.shared_pause.value)
+
+    async def _wait_turn(self):
+        # Пауза могла продлиться, пока ждали, поэтому проверяем снова
+        while True:
+            delay = self._resume_at() - monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self.bucket:
+            await self.bucket.acquire()
+
+    # RetryAfter: останавливаем всех и снижаем лимит вдвое, разом без запаса.
+    # Одновременные запросы получают RetryAfter пачкой, поэтому за одну паузу лимит снижается один раз
+    def _slow_down(self, seconds):
+        now = monotonic()
+        paused = self._resume_at() > now
+        resume_at = now + seconds
+        if resume_at > self.resume_at:
+            OUTGOING_PAUSED_SECONDS.inc(amount=resume_at - max(self.resume_at, now))
+            self.resume_at = resume_at
+        if self.shared_pause is not None:
+            with self.shared_pause.get_lock():
+                self.shared_pause.value = max(self.shared_pause.value, resume_at)
+        if not paused and self.bucket and self.bucket.rate > self.min_rate:
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+            self.bucket.burst = 1
+            OUTGOING_RATE.set(round(self.bucket.rate, 2))
+            logger.warning(f"RetryAfter {seconds:.0f} с, лимит отправки снижен до {self.bucket.rate:.1f}/с")
+
+    # Успешный запрос: понемногу возвращаем лимит
+    def _recover(self):
+        if self.bucket and self.bucket.rate < self.max_rate:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + config.OUTGOING_RECOVERY)
+            if self.bucket.rate == self.max_rate:
+                self.bucket.burst = max(int(self.max_rate), 1)
+            OUTGOING_RATE.set(round(self.bucket.rate, 2))
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        attempt = 0
+        while True:
+            await self._wait_turn()
+            try:
+                result = await callback(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == 'flood':
+                    OUTGOING_RETRY_AFTER.inc(endpoint)
+                    seconds = retry_after_seconds(e)
+                    self._slow_down(seconds)
+                    give_up = seconds > config.OUTGOING_MAX_RETRY_AFTER
+                else:
+                    give_up = not is_retryable(kind, endpoint)
+                if give_up or attempt >= self.max_retries:
+                    OUTGOING_ERRORS.inc(endpoint, kind)
+                    raise
+                OUTGOING_RETRIES.inc(endpoint, kind)
+                # После RetryAfter пауза уже выставлена для всех, свою добавляем только к сетевым ошибкам
+                if kind != 'flood':
+                    await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+            else:
+                self._recover()
+                return result
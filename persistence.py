@@ -0,0 +1,110 @@
+import json
+import logging
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Хранение состояния диалогов (ConversationHandler) и user_data в той же базе SQLite,
+# чтобы перезапуск бота не обрывал добавление и редактирование товаров.
+# Application сам собирает изменения и раз в update_interval секунд (и при остановке)
+# вызывает update_* для всех измененных записей разом. Записи уходят через общий
+# поток-писатель Database, который объединяет одновременные записи в один коммит,
+# поэтому обработчики обновлений базу не ждут.
+# bot_data (там соединение с базой, кэш) и chat_data не сохраняются.
+#
+# При нескольких процессах вебхука (process = (номер, всего)) каждый загружает только
+# своих пользователей (см. webhook.owner_process) и пишет только их записи, поэтому
+# процессы не затирают состояние друг друга.
+
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, db, update_interval=None, process=(0, 1)):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=config.PERSISTENCE_INTERVAL if update_interval is None else update_interval
+        )
+        self.db = db
+        self.process = process
+
+    def _owns(self, user_id):
+        index, count = self.process
+        return user_id % count == index
+
+    async def get_user_data(self):
+        rows = await self.db.fetchall('SELECT user_id, data FROM persistence_user_data')
+        return {user_id: json.loads(data) for user_id, data in rows if self._owns(user_id)}
+
+    async def update_user_data(self, user_id, data):
+        # Пустые user_data (диалог закончен) не храним
+        if not data:
+            await self.drop_user_data(user_id)
+            return
+        await self.db.execute(
+            'INSERT INTO persistence_user_data (user_id, data) VALUES (?, ?) '
+            'ON CONFLICT (user_id) DO UPDATE SET data = excluded.data',
+            (user_id, json.dumps(data, ensure_ascii=False))
+        )
+
+    async def drop_user_data(self, user_id):
+        await self.db.execute('DELETE FROM persistence_user_data WHERE user_id = ?', (user_id,))
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    # Ключ диалога - кортеж id (чат, пользователь), в базе хранится как JSON-список
+    async def get_conversations(self, name):
+        rows = await self.db.fetchall(
+            'SELECT key, state FROM persistence_conversations WHERE name = ?', (name,)
+        )
+        conversations = {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+        # Ключ (чат, пользователь): владелец - процесс пользователя
+        return {key: state for key, state in conversations.items() if self._owns(key[-1])}
+
+    async def update_conversation(self, name, key, new_state):
+        key = json.dumps(list(key))
+        # None - диалог завершен
+        if new_state is None:
+            await self.db.execute(
+                'DELETE FROM persistence_conversations WHERE name = ? AND key = ?', (name, key)
+            )
+            return
+        await self.db.execute(
+            'INSERT INTO persistence_conversations (name, key, state) VALUES (?, ?, ?) '
+            'ON CONFLICT (name, key) DO UPDATE SET state = excluded.state',
+            (name, key, json.dumps(new_state))
+        )
+
+    # Остальные данные не сохраняются (см. store_data)
+    async def get_chat_data(self):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    # Все update_* к этому моменту уже дождались коммита
+    async def flush(self):
+        logger.info("Состояние диалогов сохранено")
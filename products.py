@@ -0,0 +1,70 @@
+# Изменения товаров пользователя: каждое - один запрос с RETURNING,
+# условие всегда по (id, user_id), поэтому чужой товар по подделанным callback-данным
+# не найти и не изменить. Функции выполняются через Database.read / Database.write.
+
+_COLUMNS = 'id, user_id, product_name, warranty_date, next_reminder'
+
+
+# Товар в том виде, в каком он сейчас в базе
+class Product:
+    __slots__ = ('id', 'user_id', 'name', 'warranty_day', 'next_reminder')
+
+    def __init__(self, id, user_id, name, warranty_day, next_reminder):
+        self.id = id
+        self.user_id = user_id
+        self.name = name
+        self.warranty_day = warranty_day
+        self.next_reminder = next_reminder
+
+
+# Первая строка результата в виде Product или None. Курсор дочитывается до конца,
+# чтобы запрос с RETURNING завершился до коммита
+def _one(cursor):
+    rows = cursor.fetchall()
+    return Product(*rows[0]) if rows else None
+
+
+# id товара из callback-данных; None, если там не число
+def parse_product_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_product(conn, product_id, user_id):
+    return _one(conn.execute(
+        f'SELECT {_COLUMNS} FROM products WHERE id = ? AND user_id = ?', (product_id, user_id)
+    ))
+
+
+def insert_product(conn, user_id, name, warranty_day, next_reminder):
+    return _one(conn.execute(
+        'INSERT INTO products (user_id, product_name, warranty_date, next_reminder) VALUES (?, ?, ?, ?) '
+        f'RETURNING {_COLUMNS}',
+        (user_id, name, warranty_day, next_reminder)
+    ))
+
+
+# Изменения возвращают обновленный товар или None, если у пользователя такого товара нет
+def rename_product(conn, product_id, user_id, name):
+    return _one(conn.execute(
+        f'UPDATE products SET product_name = ? WHERE id = ? AND user_id = ? RETURNING {_COLUMNS}',
+        (name, product_id, user_id)
+    ))
+
+
+def change_warranty(conn, product_id, user_id, warranty_day, next_reminder):
+    return _one(conn.execute(
+        'UPDATE products SET warranty_date = ?, next_reminder = ? WHERE id = ? AND user_id = ? '
+        f'RETURNING {_COLUMNS}',
+        (warranty_day, next_reminder, product_id, user_id)
+    ))
+
+
+# Удаляет товар и возвращает его (для сообщения пользователю)
+def delete_product(conn, product_id, user_id):
+    return _one(conn.execute(
+        f'DELETE FROM products WHERE id = ? AND user_id = ? RETURNING {_COLUMNS}',
+        (product_id, user_id)
+    ))
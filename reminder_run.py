@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+
+from telegram.ext import ExtBot
+
+import config
+from database import Database
+from dispatcher import DispatchStats, ReminderDispatcher
+from metrics import REMINDER_MESSAGES, REMINDER_RUN_SECONDS, REMINDER_RUNS, REMINDER_SEND_ERRORS, USERS_BLOCKED
+from outgoing import OutgoingLimiter
+from outbox import (
+    claim_batch, count_interrupted, count_skipped_inactive, enqueue_due_reminders, mark_results, result_status
+)
+from reminders import build_digests, build_messages
+from scheduler import current_slot, reschedule_products, slot_time
+from timezones import current_buckets, list_timezones
+from users import mark_inactive
+
+logger = logging.getLogger(__name__)
+
+
+# Итоги рассылки (одного шарда или всех вместе)
+class RunSummary:
+    def __init__(self):
+        self.queued = 0
+        self.interrupted = 0
+        self.skipped = 0  # не отправлено неактивным пользователям (сэкономленные запросы)
+        self.blocked = 0  # пользователей помечено неактивными в этой рассылке
+        self.stats = DispatchStats()
+
+    def merge(self, other):
+        self.queued += other.queued
+        self.interrupted += other.interrupted
+        self.skipped += other.skipped
+        self.blocked += other.blocked
+        self.stats.sent += other.stats.sent
+        self.stats.failed += other.stats.failed
+        self.stats.latencies.extend(other.stats.latencies)
+        for error, count in other.stats.errors.items():
+            self.stats.add_error(error, count)
+
+    def describe(self):
+        return (
+            f"в очередь {self.queued}, {self.stats.summary()}, "
+            f"пропущено у заблокировавших бота {self.skipped}, новых заблокировавших {self.blocked}"
+        )
+
+    # Итоги рассылки в метрики (для шардов - в родительском процессе после слияния)
+    def record_metrics(self):
+        REMINDER_RUNS.inc()
+        REMINDER_RUN_SECONDS.observe(self.stats.elapsed)
+        REMINDER_MESSAGES.inc('queued', amount=self.queued)
+        REMINDER_MESSAGES.inc('interrupted', amount=self.interrupted)
+        REMINDER_MESSAGES.inc('sent', amount=self.stats.sent)
+        REMINDER_MESSAGES.inc('failed', amount=self.stats.failed)
+        REMINDER_MESSAGES.inc('skipped_inactive', amount=self.skipped)
+        USERS_BLOCKED.inc(amount=self.blocked)
+        for error, count in self.stats.errors.items():
+            REMINDER_SEND_ERRORS.inc(error, amount=count)
+
+
+# Полный цикл рассылки: постановка в журнал, отправка пачками, отметка результатов.
+# shard = (номер, всего) ограничивает рассылку пользователями одного шарда,
+# bucket - пользователями одной часовой корзины (см. timezones.current_buckets),
+# product_ids - товарами из созревшего слота колеса напоминаний.
+async def run_reminders(db, bot, today, shard=None, rate=None, bucket=None, product_ids=None):
+    summary = RunSummary()
+    started = monotonic()
+
+    # Ставим сегодняшние напоминания в журнал; повторный запуск в тот же день их не задублирует
+    summary.queued = await db.write(enqueue_due_reminders, today, shard, bucket, product_ids)
+    summary.interrupted = await db.read(count_interrupted, today, shard, bucket)
+    if summary.interrupted:
+        logger.warning(
+            f"После сбоя не подтверждена отправка {summary.interrupted} напоминаний, повторно не отправляем")
+
+    await send_queued(db, bot, today, summary, shard, rate)
+    summary.stats.elapsed = monotonic() - started
+    return summary
+
+
+# Рассылает все, что ждет в журнале (см. claim_batch), и дописывает итоги в summary.
+# Отправляем пачками: каждая пачка забирается из журнала и сразу отмечается результатом,
+# поэтому после перезапуска рассылка продолжится с того же места
+async def send_queued(db, bot, today, summary, shard=None, rate=None):
+    dispatcher = ReminderDispatcher(bot, rate=rate)
+    build = build_digests if config.REMINDER_DIGEST else build_messages
+
+    while True:
+        batch = await db.write(
+            claim_batch, today, config.REMINDER_BATCH, config.REMINDER_MAX_ATTEMPTS, shard
+        )
+        if not batch:
+            break
+
+        results = {}
+
+        # Повторяются только временные ошибки, см. outbox.result_status
+        def on_result(keys, error):
+            results.setdefault(result_status(error), []).extend(keys)
+
+        # Отправляем параллельно с соблюдением лимитов Telegram
+        stats = await dispatcher.run(build(batch), on_result)
+        await db.write(mark_results, results)
+        # Заблокировавших бота больше не выбираем, пока не нажмут /start
+        if stats.blocked:
+            await db.write(mark_inactive, stats.blocked)
+            summary.blocked += len(stats.blocked)
+        summary.stats.sent += stats.sent
+        summary.stats.failed += stats.failed
+        summary.stats.latencies.extend(stats.latencies)
+        for error, count in stats.errors.items():
+            summary.stats.add_error(error, count)
+        logger.debug(f"Пачка напоминаний: {stats.summary()}")
+
+
+# Дорассылка после перезапуска: напоминания, поставленные в очередь, но не отправленные
+# из-за падения процесса. Новых напоминаний не ставит
+async def resume_reminders(db, bot, today, shard=None, rate=None):
+    summary = RunSummary()
+    started = monotonic()
+    await send_queued(db, bot, today, summary, shard, rate)
+    summary.stats.elapsed = monotonic() - started
+    return summary
+
+
+# Сообщения, не отправленные заблокировавшим бота, во всех корзинах часа now
+async def count_skipped(db, timezones, now, shard=None):
+    skipped = 0
+    for today, bucket in current_buckets(timezones, now):
+        skipped += await db.read(count_skipped_inactive, today, shard, bucket, config.REMINDER_DIGEST)
+    return skipped
+
+
+# Рассылка часа now (aware datetime): все корзины пользователей, у которых сейчас их час
+async def run_hour(db, bot, now, shard=None, rate=None):
+    summary = RunSummary()
+    started = monotonic()
+    timezones = await db.read(list_timezones)
+    for today, bucket in current_buckets(timezones, now):
+        summary.merge(await run_reminders(db, bot, today, shard, rate, bucket))
+    # Остатки прерванных рассылок (даже если в этот час корзин нет)
+    await send_queued(db, bot, now.date(), summary, shard, rate)
+    summary.skipped = await count_skipped(db, timezones, now, shard)
+    summary.stats.elapsed = monotonic() - started
+    return summary
+
+
+# Рассылка по колесу напоминаний: только товары созревших слотов, без сканирования таблицы.
+# Каждый слот рассылается по своему часу (если задание запустилось с опозданием),
+# после рассылки товары перепланируются по новому next_reminder.
+async def run_wheel(db, bot, wheel, now, rate=None):
+    summary = RunSummary()
+    started = monotonic()
+    due = wheel.pop_due(current_slot(now))
+    timezones = await db.read(list_timezones)
+    for slot, product_ids in due:
+        try:
+            for today, bucket in current_buckets(timezones, slot_time(slot)):
+                summary.merge(await run_reminders(db, bot, today, rate=rate, bucket=bucket, product_ids=product_ids))
+        finally:
+            # Даже после ошибки товары должны вернуться в колесо
+            await reschedule_products(db, wheel, product_ids, now)
+    # Остатки прерванных рассылок (даже если созревших слотов нет)
+    await send_queued(db, bot, now.date(), summary, rate=rate)
+    # Товаров неактивных пользователей в колесе нет, поэтому пропуски считаем по корзинам часа,
+    # даже когда созревших слотов нет
+    summary.skipped = await count_skipped(db, timezones, now)
+    summary.stats.elapsed = monotonic() - started
+    return summary
+
+
+# Лимит Bot API на все шарды вместе: часть OUTGOING_RATE остается обработчикам бота
+# (не больше половины лимита), 0 - без лимита
+def shard_outgoing_rate():
+    if config.OUTGOING_RATE <= 0:
+        return 0
+    return max(config.OUTGOING_RATE - config.OUTGOING_HANDLER_RATE, config.OUTGOING_RATE / 2)
+
+
+# Общая пауза после RetryAfter, передается процессам пула при запуске (см. run_sharded)
+_shared_pause = None
+
+
+def _init_shard_process(shared_pause):
+    global _shared_pause
+    _shared_pause = shared_pause
+
+
+# Рассылка одного шарда в отдельном процессе: свое соединение с базой и свой клиент Bot.
+# Общий лимит Telegram действует на весь бот, поэтому делится между шардами.
+async def _run_shard(index, count, now):
+    db = Database()
+    try:
+        limiter = OutgoingLimiter(rate=shard_outgoing_rate() / count, shared_pause=_shared_pause)
+        async with ExtBot(config.BOT_TOKEN, rate_limiter=limiter) as bot:
+            return await run_hour(db, bot, now, (index, count), rate=config.REMINDER_RATE / count)
+    finally:
+        await db.close()
+
+
+def run_shard(index, count, now):
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    summary = asyncio.run(_run_shard(index, count, now))
+    logger.info(f"Шард {index + 1}/{count}: {summary.describe()}")
+    return summary
+
+
+# Запускает все шарды в пуле процессов и собирает общий итог.
+# limiter - OutgoingLimiter бота: на время рассылки у него остается только часть лимита
+# для обработчиков, и паузу после RetryAfter он делит с шардами.
+async def run_sharded(now, count, limiter=None):
+    loop = asyncio.get_running_loop()
+    started = monotonic()
+    # spawn: дочерний процесс не наследует потоки и соединения родителя
+    context = multiprocessing.get_context('spawn')
+    shared_pause = context.Value('d', 0.0)
+    pool = ProcessPoolExecutor(
+        max_workers=count, mp_context=context, initializer=_init_shard_process, initargs=(shared_pause,)
+    )
+    if limiter is not None:
+        limiter.shared_pause = shared_pause
+        limiter.set_max_rate(config.OUTGOING_RATE - shard_outgoing_rate())
+    try:
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, run_shard, index, count, now)
+            for index in range(count)
+        ), return_exceptions=True)
+    finally:
+        if limiter is not None:
+            limiter.shared_pause = None
+            limiter.set_max_rate(config.OUTGOING_RATE)
+        # shutdown ждет завершения процессов, поэтому не в цикле событий
+        await loop.run_in_executor(None, pool.shutdown)
+
+    # Упавший шард можно просто перезапустить: журнал не даст отправить дважды
+    summary = RunSummary()
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            logger.error(f"Шард {index + 1}/{count} завершился с ошибкой: {result}")
+        else:
+            summary.merge(result)
+    summary.stats.elapsed = monotonic() - started
+    return summary
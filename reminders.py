@@ -0,0 +1,79 @@
+from telegram.constants import MessageLimit
+
+# За сколько дней до окончания гарантии напоминаем (по убыванию)
+REMINDER_DAYS = (30, 14, 7, 1, 0)
+
+# Текст отдельного напоминания для каждого порога
+REMINDER_TEXTS = {
+    0: "⚠️ *СРОЧНО!* Гарантия на '{name}' истекает сегодня!",
+    1: "🔔 Завтра истекает гарантия на '{name}'",
+    7: "📢 Неделя осталась! Гарантия на '{name}' истекает через 7 дней",
+    14: "📅 Напоминание: до окончания гарантии на '{name}' осталось 14 дней",
+    30: "📅 Напоминание: до окончания гарантии на '{name}' остался 1 месяц",
+}
+
+# Строка товара в сводке
+DIGEST_LINES = {
+    0: "⚠️ *{name}* — истекает сегодня!",
+    1: "🔔 *{name}* — истекает завтра",
+    7: "📢 *{name}* — осталась неделя",
+    14: "📅 *{name}* — осталось 14 дней",
+    30: "📅 *{name}* — остался 1 месяц",
+}
+
+DIGEST_HEADER = "*🔔 Напоминания о гарантии:*\n\n"
+
+
+# День ближайшего напоминания не раньше from_day (None - напоминаний больше не будет).
+# Дни - порядковые номера дат (date.toordinal()), как они хранятся в базе.
+def next_reminder_day(warranty_day, from_day):
+    for days in REMINDER_DAYS:
+        if warranty_day - days >= from_day:
+            return warranty_day - days
+    return None
+
+
+def reminder_text(product_name, days_left):
+    return REMINDER_TEXTS[days_left].format(name=product_name)
+
+
+# Отдельное сообщение на каждое напоминание:
+# (user_id, days_left, product_name, key) -> [(user_id, text, [key])]
+def build_messages(reminders):
+    return [
+        (user_id, reminder_text(product_name, days_left), [key])
+        for user_id, days_left, product_name, key in reminders
+    ]
+
+
+# Сводки по пользователям: (user_id, days_left, product_name, key) -> [(user_id, text, keys)].
+# Товары идут от самых срочных; сводка делится на части только если не влезает в одно сообщение.
+def build_digests(reminders, limit=MessageLimit.MAX_TEXT_LENGTH):
+    by_user = {}
+    for user_id, days_left, product_name, key in reminders:
+        by_user.setdefault(user_id, []).append((days_left, product_name, key))
+
+    messages = []
+    for user_id, items in by_user.items():
+        if len(items) == 1:
+            days_left, product_name, key = items[0]
+            messages.append((user_id, reminder_text(product_name, days_left), [key]))
+            continue
+
+        items.sort(key=lambda item: item[0])
+        parts = [DIGEST_HEADER]
+        size = len(DIGEST_HEADER)
+        keys = []
+        for days_left, product_name, key in items:
+            line = DIGEST_LINES[days_left].format(name=product_name) + "\n"
+            if size + len(line) > limit and keys:
+                messages.append((user_id, "".join(parts), keys))
+                parts = [DIGEST_HEADER]
+                size = len(DIGEST_HEADER)
+                keys = []
+            parts.append(line)
+            size += len(line)
+            keys.append(key)
+        messages.append((user_id, "".join(parts), keys))
+
+    return messages
@@ -0,0 +1,134 @@
+from datetime import date
+from functools import lru_cache
+
+from telegram import (
+    ReplyKeyboardMarkup,
+    KeyboardButton,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton
+)
+
+# Отрисовка сообщений и клавиатур. Клавиатуры неизменяемые, поэтому создаются один раз
+# и переиспользуются во всех ответах.
+
+# Главное меню
+MAIN_MENU = ReplyKeyboardMarkup([
+    [KeyboardButton("📦 Добавить товар"), KeyboardButton("📋 Мои товары")]
+], resize_keyboard=True)
+
+# Меню отмены (для состояний добавления/редактирования)
+CANCEL_MENU = ReplyKeyboardMarkup([
+    [KeyboardButton("↩️ Отмена")]
+], resize_keyboard=True)
+
+# Клавиатура управления товаром
+PRODUCT_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✏️ Изменить название", callback_data="edit_name")],
+    [InlineKeyboardButton("📅 Изменить дату гарантии", callback_data="edit_date")],
+    [InlineKeyboardButton("🗑️ Удалить товар", callback_data="delete_product")],
+    [InlineKeyboardButton("↩️ Назад к списку", callback_data="back_to_list")]
+])
+
+# Клавиатура подтверждения удаления
+DELETE_CONFIRM_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("✅ Да, удалить", callback_data="confirm_delete"),
+        InlineKeyboardButton("❌ Нет, отмена", callback_data="cancel_delete")
+    ]
+])
+
+EMPTY_LIST_TEXT = (
+    "*📭 У вас пока нет добавленных товаров.*\n\n"
+    "*Нажмите* \"📦 Добавить товар\"*, чтобы добавить первый товар.*"
+)
+
+# Статусы по количеству оставшихся дней. Статус "Активна" не показываем -
+# только предупреждения, поэтому дальше STATUS_HORIZON дней статуса нет.
+EXPIRED_STATUS = "❌ Просрочено"
+STATUS_HORIZON = 30
+
+
+# Таблица статусов на каждый день от 0 до STATUS_HORIZON по границам (до N дней включительно, статус)
+def _status_table(cutoffs):
+    return tuple(
+        next((status for limit, status in cutoffs if days_left <= limit), None)
+        for days_left in range(STATUS_HORIZON + 1)
+    )
+
+
+# В списке отдельно выделяется последний день, в карточке товара - нет
+LIST_STATUSES = _status_table(((0, "⚠️ Заканчивается сегодня"), (7, "🔥 Срочно"), (30, "⚠️ Скоро закончится")))
+CARD_STATUSES = _status_table(((7, "🔥 Срочно"), (30, "⚠️ Скоро закончится")))
+
+
+def product_status(days_left, table=LIST_STATUSES):
+    if days_left < 0:
+        return EXPIRED_STATUS
+    if days_left <= STATUS_HORIZON:
+        return table[days_left]
+    return None
+
+
+# Дата в виде ДД.ММ.ГГГГ по номеру дня. Дат в работе немного, поэтому кэшируем
+@lru_cache(maxsize=4096)
+def format_day(day):
+    value = date.fromordinal(day)
+    return f"{value.day:02}.{value.month:02}.{value.year}"
+
+
+# Карточка товара в меню управления
+def render_product_card(product_name, warranty_day, today_day):
+    days_left = warranty_day - today_day
+    status = product_status(days_left, CARD_STATUSES)
+    status_text = f"📊 *Статус:* {status}\n" if status else ""
+    return (
+        f"*✏️ Управление товаром:*\n\n"
+        f"📦 *{product_name}*\n"
+        f"📅 *Гарантия до:* {format_day(warranty_day)}\n"
+        f"⏳ *Осталось дней:* {days_left}\n"
+        f"{status_text}\n"
+        f"*Выберите действие:*"
+    )
+
+
+def render_delete_confirm(product_name):
+    return (
+        f"*🗑️ Подтверждение удаления*\n\n"
+        f"*Вы уверены, что хотите удалить товар?*\n\n"
+        f"📦 *{product_name}*\n\n"
+    )
+
+
+# Список товаров (id, название, номер дня) за один проход: текст и строки кнопок редактирования
+def render_product_list(products, today_day, header):
+    parts = [header]
+    keyboard = []
+
+    for product_id, product_name, warranty_day in products:
+        days_left = warranty_day - today_day
+        status = product_status(days_left)
+        parts.append(
+            f"📦 *{product_name}*\n"
+            f"📅 *До:* {format_day(warranty_day)}\n"
+            f"⏳ *Осталось:* {days_left} дней\n"
+        )
+        if status:
+            parts.append(f"📊 *{status}*\n")
+        parts.append("\n")
+
+        display_name = product_name[:30] + "..." if len(product_name) > 30 else product_name
+        keyboard.append([
+            InlineKeyboardButton(f"✏️ {display_name}", callback_data=f"edit_{product_id}")
+        ])
+
+    return "".join(parts), keyboard
+
+
+# Архив: только текст, товары уже нельзя редактировать
+def render_archive(products, total):
+    parts = ["*🗄 Архив просроченных товаров:*\n\n"]
+    for product_name, warranty_day in products:
+        parts.append(f"📦 *{product_name}*\n📅 *Гарантия до:* {format_day(warranty_day)}\n\n")
+    if total > len(products):
+        parts.append(f"_Показаны последние {len(products)} из {total}_")
+    return "".join(parts)
@@ -0,0 +1,128 @@
+import heapq
+import json
+from array import array
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import config
+from users import active_condition
+
+# Колесо напоминаний в памяти: для каждого часа (слота) - id товаров, у которых в этот час
+# срабатывает напоминание. Слот - номер часа от начала эпохи UTC: местная дата next_reminder
+# в час рассылки пользователя в его часовом поясе. Рассылка забирает созревшие слоты
+# и не сканирует таблицу товаров.
+#
+# На товар в слоте уходит 8 байт (array('q')). Записи не удаляются: при изменении товара
+# он просто добавляется в новый слот, а при срабатывании база проверяет, что напоминание
+# действительно на эту дату, поэтому устаревшие и удаленные записи отбрасываются сами.
+
+
+class ReminderWheel:
+    def __init__(self):
+        self.slots = {}  # слот -> array('q') id товаров
+        self._heap = []  # номера непустых слотов для поиска созревших
+        self.size = 0
+
+    def add(self, product_id, slot):
+        ids = self.slots.get(slot)
+        if ids is None:
+            ids = self.slots[slot] = array('q')
+            heapq.heappush(self._heap, slot)
+        ids.append(product_id)
+        self.size += 1
+
+    # Забирает все слоты до slot включительно: [(слот, [id товаров без повторов])]
+    def pop_due(self, slot):
+        due = []
+        while self._heap and self._heap[0] <= slot:
+            due_slot = heapq.heappop(self._heap)
+            ids = self.slots.pop(due_slot)
+            self.size -= len(ids)
+            due.append((due_slot, sorted(set(ids))))
+        return due
+
+    def stats(self):
+        return {
+            'products': self.size,
+            'slots': len(self.slots),
+            'bytes': sum(ids.buffer_info()[1] * ids.itemsize for ids in self.slots.values()),
+        }
+
+
+def slot_time(slot):
+    return datetime.fromtimestamp(slot * 3600, timezone.utc)
+
+
+# Слот напоминания на день day в час hour часового пояса: первое начало часа UTC внутри
+# этого местного часа (для поясов со смещением +5:30 - округление вверх).
+# Комбинаций немного, поэтому кэшируем
+@lru_cache(maxsize=65536)
+def _slot(day, timezone_name, hour):
+    local = datetime.combine(datetime.fromordinal(day).date(), time(hour), ZoneInfo(timezone_name))
+    return -(-int(local.timestamp()) // 3600)
+
+
+# Слот товара; пропущенное напоминание переносится на ближайший час рассылки пользователя,
+# начиная с текущего (как при ежечасной рассылке: next_reminder <= сегодня)
+def reminder_slot(day, timezone_name, hour, now_slot):
+    slot = _slot(day, timezone_name, hour)
+    if slot >= now_slot:
+        return slot
+    local_today = slot_time(now_slot).astimezone(ZoneInfo(timezone_name)).date()
+    slot = _slot(local_today.toordinal(), timezone_name, hour)
+    return slot if slot >= now_slot else _slot((local_today + timedelta(days=1)).toordinal(), timezone_name, hour)
+
+
+def current_slot(now):
+    return int(now.timestamp()) // 3600
+
+
+# Товары неактивных пользователей в колесо не ставятся, после /start они загружаются заново
+_SCHEDULE_SQL = (
+    'SELECT p.id, p.next_reminder, s.timezone, s.reminder_hour '
+    'FROM products p LEFT JOIN user_settings s ON s.user_id = p.user_id '
+    'WHERE p.next_reminder IS NOT NULL' + active_condition('p.user_id')
+)
+
+
+def _schedule(wheel, rows, now_slot):
+    count = 0
+    for product_id, day, timezone_name, hour in rows:
+        wheel.add(product_id, reminder_slot(
+            day,
+            timezone_name or config.DEFAULT_TIMEZONE,
+            config.REMINDER_HOUR if hour is None else hour,
+            now_slot
+        ))
+        count += 1
+    return count
+
+
+# Заполняет колесо всеми предстоящими напоминаниями. Строки читаются курсором по одной,
+# без fetchall. Выполняется в пуле читателей при старте бота
+def load_wheel(conn, wheel, now):
+    return _schedule(wheel, conn.execute(_SCHEDULE_SQL), current_slot(now))
+
+
+# Строки для перепланирования товаров по id (после добавления, изменения даты, рассылки)
+def fetch_schedule(conn, product_ids):
+    return conn.execute(
+        _SCHEDULE_SQL + ' AND p.id IN (SELECT value FROM json_each(?))', (json.dumps(product_ids),)
+    ).fetchall()
+
+
+# Строки для перепланирования всех товаров пользователя (после смены часового пояса или часа)
+def fetch_user_schedule(conn, user_id):
+    return conn.execute(_SCHEDULE_SQL + ' AND p.user_id = ?', (user_id,)).fetchall()
+
+
+# Перепланирует товары по их текущему состоянию в базе
+async def reschedule_products(db, wheel, product_ids, now=None):
+    rows = await db.read(fetch_schedule, list(product_ids))
+    return _schedule(wheel, rows, current_slot(now or datetime.now(timezone.utc)))
+
+
+async def reschedule_user(db, wheel, user_id, now=None):
+    rows = await db.read(fetch_user_schedule, user_id)
+    return _schedule(wheel, rows, current_slot(now or datetime.now(timezone.utc)))
@@ -0,0 +1,101 @@
+import logging
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Часовые пояса пользователей и часовые корзины рассылки.
+# Настройки хранятся в user_settings (часовой пояс IANA и час рассылки по местному времени).
+# Рассылка запускается в начале каждого часа и берет только тех пользователей, у кого в их
+# часовом поясе сейчас выбранный час, поэтому нагрузка распределяется по суткам, а переход
+# на летнее время учитывается сам собой.
+
+# Смещение от UTC: +3, -5, UTC+3, GMT-5
+_OFFSET_RE = re.compile(r'(?:utc|gmt)?\s*([+-])\s*(\d{1,2})', re.IGNORECASE)
+
+
+# Часовой пояс по названию IANA (Europe/Moscow) или смещению (+3); None, если такого нет
+def parse_timezone(text):
+    text = text.strip()
+    match = _OFFSET_RE.fullmatch(text)
+    if match:
+        sign, hours = match.groups()
+        if int(hours) > 14:
+            return None
+        # В Etc/GMT знак обратный: Etc/GMT-3 - это UTC+3
+        text = 'Etc/GMT' if hours == '0' else f"Etc/GMT{'-' if sign == '+' else '+'}{int(hours)}"
+    try:
+        ZoneInfo(text)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return text
+
+
+# Местное время в часовом поясе; None, если пояс неизвестен
+def _local(now, timezone):
+    try:
+        return now.astimezone(ZoneInfo(timezone))
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Неизвестный часовой пояс в настройках: {timezone}")
+        return None
+
+
+# Сегодняшняя местная дата в часовом поясе пользователя (неизвестный пояс - DEFAULT_TIMEZONE)
+def local_today(timezone, now=None):
+    now = now or datetime.now().astimezone()
+    local = _local(now, timezone) or now.astimezone(ZoneInfo(config.DEFAULT_TIMEZONE))
+    return local.date()
+
+
+# Корзины, которые нужно разослать в момент now (aware datetime): [(местная дата, корзина)].
+# Корзина - ((часовой пояс, час), ...) и флаг, входят ли в нее пользователи без настроек
+# (у них DEFAULT_TIMEZONE и REMINDER_HOUR). У пользователей одного часа местная дата
+# может отличаться, поэтому корзины группируются по дате.
+def current_buckets(timezones, now, default_timezone=None, default_hour=None):
+    default_timezone = default_timezone or config.DEFAULT_TIMEZONE
+    default_hour = config.REMINDER_HOUR if default_hour is None else default_hour
+
+    pairs = {}
+    for timezone in timezones:
+        local = _local(now, timezone)
+        if local is not None:
+            pairs.setdefault(local.date(), []).append((timezone, local.hour))
+
+    default_date = None
+    local = _local(now, default_timezone)
+    if local is not None and local.hour == default_hour:
+        default_date = local.date()
+        pairs.setdefault(default_date, [])
+
+    return [
+        (today, (tuple(today_pairs), today == default_date))
+        for today, today_pairs in sorted(pairs.items())
+    ]
+
+
+# Все часовые поясы из настроек пользователей (по индексу, их немного)
+def list_timezones(conn):
+    return [row[0] for row in conn.execute('SELECT DISTINCT timezone FROM user_settings')]
+
+
+# Настройки пользователя: (часовой пояс, час); без записи - значения по умолчанию
+def get_settings(conn, user_id):
+    row = conn.execute(
+        'SELECT timezone, reminder_hour FROM user_settings WHERE user_id = ?', (user_id,)
+    ).fetchone()
+    return row or (config.DEFAULT_TIMEZONE, config.REMINDER_HOUR)
+
+
+# Меняет часовой пояс и/или час рассылки, возвращает новые настройки
+def update_settings(conn, user_id, timezone=None, hour=None):
+    current_timezone, current_hour = get_settings(conn, user_id)
+    settings = (timezone or current_timezone, current_hour if hour is None else hour)
+    conn.execute(
+        'INSERT INTO user_settings (user_id, timezone, reminder_hour) VALUES (?, ?, ?) '
+        'ON CONFLICT (user_id) DO UPDATE SET timezone = excluded.timezone, reminder_hour = excluded.reminder_hour',
+        (user_id, *settings)
+    )
+    return settings
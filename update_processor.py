@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+# Обновления разных пользователей обрабатываются одновременно (не больше max_concurrent_updates),
+# а обновления одного пользователя - строго по очереди, поэтому ConversationHandler
+# и user_data видят сообщения в том порядке, в котором их прислали.
+#
+# Семафор PTB берется до do_process_update и держался бы все время, пока обновление
+# ждет предыдущее того же пользователя: один пользователь, приславший пачку сообщений,
+# занял бы все места. Поэтому семафор PTB сделан безлимитным (do_process_update вызывается
+# сразу, в порядке поступления), а лимит одновременной обработки - свой, и место
+# занимается только после очереди пользователя.
+
+# Лимит для семафора PTB: фактически без ограничения (его же показывает
+# Application.concurrent_updates; настоящий лимит - PerUserUpdateProcessor.limit)
+_UNBOUNDED = 2 ** 31 - 1
+
+
+# Ключ очереди: пользователь, для обновлений без пользователя - чат; None - без порядка
+def update_key(update):
+    user = getattr(update, 'effective_user', None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, 'effective_chat', None)
+    return chat.id if chat is not None else None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates=None):
+        super().__init__(_UNBOUNDED)
+        self.limit = config.UPDATE_CONCURRENCY if max_concurrent_updates is None else max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(self.limit)
+        self._tails = {}  # ключ -> Event завершения последнего поступившего обновления
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        # Встаем в очередь пользователя до первого await, то есть в порядке поступления
+        previous = self._tails.get(key)
+        done = self._tails[key] = asyncio.Event()
+        try:
+            if previous is not None:
+                await previous.wait()
+            async with self._slots:
+                await coroutine
+        finally:
+            done.set()
+            if self._tails.get(key) is done:
+                del self._tails[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,38 @@
+# Статус доставки пользователям (таблица users). Если пользователь заблокировал бота,
+# Telegram отвечает Forbidden - такой пользователь помечается неактивным и больше не попадает
+# в рассылку, пока снова не нажмет /start. Записи есть только у тех, кто хоть раз
+# блокировал бота или запускал /start; без записи пользователь считается активным.
+
+
+# Условие: пользователь не помечен неактивным (по частичному индексу idx_users_inactive)
+def active_condition(column):
+    return f' AND {column} NOT IN (SELECT user_id FROM users WHERE active = 0)'
+
+
+# Помечает неактивными пользователей, заблокировавших бота
+def mark_inactive(conn, user_ids):
+    conn.executemany(
+        'INSERT INTO users (user_id, active, blocked_at) VALUES (?, 0, CURRENT_TIMESTAMP) '
+        'ON CONFLICT (user_id) DO UPDATE SET active = 0, blocked_at = CURRENT_TIMESTAMP, '
+        'updated_at = CURRENT_TIMESTAMP',
+        [(user_id,) for user_id in user_ids]
+    )
+
+
+# Пользователь снова написал боту. Возвращает True, если он был неактивным
+def activate_user(conn, user_id):
+    row = conn.execute('SELECT active FROM users WHERE user_id = ?', (user_id,)).fetchone()
+    if row is None:
+        conn.execute('INSERT INTO users (user_id) VALUES (?)', (user_id,))
+        return False
+    if row[0]:
+        return False
+    conn.execute(
+        'UPDATE users SET active = 1, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?', (user_id,)
+    )
+    return True
+
+
+# Всего неактивных пользователей
+def count_inactive(conn):
+    return conn.execute('SELECT COUNT(*) FROM users WHERE active = 0').fetchone()[0]
@@ -0,0 +1,179 @@
+import asyncio
+import fcntl
+import hmac
+import json
+import logging
+import signal
+
+import httpx
+from telegram import Update
+
+import config
+from httpserver import HttpError, HttpServer
+from update_processor import update_key
+
+logger = logging.getLogger(__name__)
+
+# Режим вебхука: Telegram присылает обновления POST-запросами на локальный эндпоинт,
+# а мы кладем их в update_queue приложения.
+#
+# Для горизонтального масштабирования запускается N процессов (--process i/N) за
+# балансировщиком. Состояние диалогов, user_data и порядок обновлений пользователя
+# (PerUserUpdateProcessor) живут в памяти процесса, поэтому каждый пользователь закреплен
+# за одним процессом: update_key % N. Процесс, получивший чужое обновление от балансировщика,
+# пересылает его процессу-владельцу и отвечает Telegram его ответом - при ошибке Telegram
+# повторит доставку. Число процессов меняется только полным перезапуском всех процессов.
+# Процесс i слушает WEBHOOK_PORT + i (адреса можно задать в WEBHOOK_PEERS).
+#
+# Проверить локально можно, отправив записанное обновление:
+#   curl -H 'X-Telegram-Bot-Api-Secret-Token: <секрет>' -d @update.json http://127.0.0.1:8443/telegram
+
+# Пометка пересланного обновления: его обрабатывают на месте и дальше не пересылают
+FORWARDED_HEADER = 'X-Bot-Forwarded'
+
+
+# Процесс-владелец ключа (пользователя или чата); None - обрабатывать где получено
+def owner_process(key, count):
+    return None if key is None else key % count
+
+
+# Адреса всех процессов по номеру: WEBHOOK_PEERS или локальные порты WEBHOOK_PORT + i
+def peer_urls(count):
+    if config.WEBHOOK_PEERS:
+        peers = [peer.strip().rstrip('/') for peer in config.WEBHOOK_PEERS.split(',')]
+        if len(peers) != count:
+            raise RuntimeError(f"В WEBHOOK_PEERS {len(peers)} адресов, а процессов {count}")
+        return peers
+    return [f"http://127.0.0.1:{config.WEBHOOK_PORT + index}" for index in range(count)]
+
+
+# Блокировка файла рядом с базой на все время работы: два процесса с одним номером
+# не запустятся. Возвращает открытый файл - блокировка держится, пока он не закрыт
+def lock_process(index, db_path=None):
+    path = f"{db_path or config.DB_PATH}.webhook{index}.lock"
+    lock = open(path, 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        raise RuntimeError(f"Процесс вебхука {index + 1} с базой {config.DB_PATH} уже запущен (занят {path})")
+    return lock
+
+
+# process = (номер, всего); peers - адреса процессов для пересылки, client - httpx.AsyncClient
+def make_handler(application, url_path, secret_token, process=(0, 1), peers=None, client=None):
+    index, count = process
+
+    async def forward(owner, body):
+        try:
+            response = await client.post(
+                peers[owner] + url_path,
+                content=body,
+                headers={
+                    'Content-Type': 'application/json',
+                    'X-Telegram-Bot-Api-Secret-Token': secret_token,
+                    FORWARDED_HEADER: '1',
+                }
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Не удалось переслать обновление процессу {owner + 1}: {e}")
+            raise HttpError(502)
+        if response.status_code != 200:
+            raise HttpError(response.status_code)
+        return 200, 'text/plain', b''
+
+    async def handle(method, path, headers, body):
+        if path != url_path:
+            raise HttpError(404)
+        if method != 'POST':
+            raise HttpError(405)
+        if secret_token and not hmac.compare_digest(
+            headers.get('x-telegram-bot-api-secret-token', '').encode(), secret_token.encode()
+        ):
+            raise HttpError(403)
+        # После начала остановки новые обновления не берем - Telegram пришлет их повторно
+        if not application.running:
+            raise HttpError(503)
+
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                raise ValueError('обновление должно быть JSON-объектом')
+            update = Update.de_json(data, application.bot)
+        except Exception as e:
+            logger.warning(f"Некорректное обновление в вебхуке: {e}")
+            raise HttpError(400)
+
+        owner = owner_process(update_key(update), count)
+        if owner is not None and owner != index:
+            if FORWARDED_HEADER.lower() in headers:
+                # Процессы запущены с разным N - обрабатываем, чтобы не гонять обновление по кругу
+                logger.warning(f"Пересланное обновление {update.update_id} принадлежит процессу {owner + 1}")
+            else:
+                return await forward(owner, body)
+
+        await application.update_queue.put(update)
+        return 200, 'text/plain', b''
+
+    return handle
+
+
+async def serve_webhook(application, listen=None, port=None, url_path=None, secret_token=None,
+                        webhook_url=None, drain_timeout=None, process=(0, 1)):
+    index, count = process
+    listen = listen or config.WEBHOOK_LISTEN
+    port = config.WEBHOOK_PORT + index if port is None else port
+    url_path = url_path or config.WEBHOOK_PATH
+    secret_token = config.WEBHOOK_SECRET if secret_token is None else secret_token
+    webhook_url = config.WEBHOOK_URL if webhook_url is None else webhook_url
+    drain_timeout = config.WEBHOOK_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+
+    if not secret_token:
+        logger.warning("WEBHOOK_SECRET не задан: запросы к вебхуку не проверяются")
+
+    peers = peer_urls(count) if count > 1 else None
+    lock = lock_process(index)
+    client = httpx.AsyncClient(timeout=config.WEBHOOK_FORWARD_TIMEOUT) if peers else None
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    server = HttpServer(make_handler(application, url_path, secret_token, process, peers, client), listen, port)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        await server.start()
+
+        # Регистрируем вебхук только если задан публичный адрес (при нескольких процессах - в первом)
+        if webhook_url and index == 0:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token or None,
+                allowed_updates=Update.ALL_TYPES
+            )
+
+        await stop_event.wait()
+        logger.info("Остановка: дожидаемся обработки принятых обновлений...")
+
+        # Сначала закрываем вход, затем Application.stop() обрабатывает все, что уже в очереди
+        await server.drain(drain_timeout)
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+    finally:
+        if not server.draining:
+            await server.drain(0)
+        if client is not None:
+            await client.aclose()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        lock.close()
+
+
+def run_webhook(application, **kwargs):
+    asyncio.run(serve_webhook(application, **kwargs))